@@ -1,42 +1,260 @@
 import os
-from datetime import datetime
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Any, Optional
 import json
 from google.cloud import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+logger = logging.getLogger(__name__)
+
+# Bucket holding room file attachments; URLs are normalized to object names
+# at insertion time so cleanup compares short names, not rebuilt URLs
+_FILES_BUCKET = "board-sync-466501.appspot.com"
+_FILES_URL_PREFIX = f"https://storage.googleapis.com/{_FILES_BUCKET}/"
+
+# Clients are cached at module scope so every FirestoreManager instance shares
+# one gRPC channel / credential set instead of rebuilding them per instance
+_CLIENT_CACHE: Dict[str, firestore.Client] = {}
+_ASYNC_CLIENT_CACHE: Dict[str, firestore.AsyncClient] = {}
+_STORAGE_CLIENT_CACHE: Dict[str, Any] = {}
+
+# The AsyncClient's gRPC aio channel is created lazily on its first RPC and
+# stays bound to whichever event loop ran it. All async-client work therefore
+# runs on this one long-lived loop (daemon thread, started on first use) —
+# hopping loops would break every call after the first with cross-loop
+# Future errors.
+_ASYNC_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_ASYNC_LOOP_LOCK = threading.Lock()
+
+
+def _get_async_loop() -> asyncio.AbstractEventLoop:
+    global _ASYNC_LOOP
+    with _ASYNC_LOOP_LOCK:
+        if _ASYNC_LOOP is None or _ASYNC_LOOP.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="firestore-async", daemon=True
+            ).start()
+            _ASYNC_LOOP = loop
+    return _ASYNC_LOOP
+
+
+def _tune_grpc_channel(client: firestore.Client) -> None:
+    """Prime the client's gRPC channel with high-fanout options.
+
+    The SDK builds its channel lazily with only keepalive configured, which
+    serializes heavy cleanup fan-out on one HTTP/2 channel. Recreate the
+    channel up front with a larger concurrent-stream budget and a local
+    subchannel pool. Falls back to the default channel if the lazy-init
+    internals ever change shape.
+    """
+    try:
+        from google.cloud.firestore_v1.services.firestore import client as gapic_client
+        from google.cloud.firestore_v1.services.firestore.transports.grpc import FirestoreGrpcTransport
+
+        channel = FirestoreGrpcTransport.create_channel(
+            client._target,
+            credentials=client._credentials,
+            options=[
+                ("grpc.keepalive_time_ms", 30000),
+                ("grpc.max_concurrent_streams", 1000),
+                ("grpc.use_local_subchannel_pool", 1),
+            ],
+        )
+        client._transport = FirestoreGrpcTransport(host=client._target, channel=channel)
+        client._firestore_api_internal = gapic_client.FirestoreClient(
+            transport=client._transport, client_options=client._client_options
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Could not tune Firestore gRPC channel, using defaults: {e}")
+
+
+def _get_firestore_client(key_file: str) -> firestore.Client:
+    client = _CLIENT_CACHE.get(key_file)
+    if client is None:
+        if os.path.exists(key_file):
+            client = firestore.Client.from_service_account_json(key_file)
+            logger.info(f"✅ Firestore client initialized with service account: {key_file}")
+        else:
+            # Use default credentials (for Cloud Run)
+            client = firestore.Client()
+            logger.info("✅ Firestore client initialized with default credentials (Cloud Run)")
+        _tune_grpc_channel(client)
+        _CLIENT_CACHE[key_file] = client
+    return client
+
+
+def _get_async_firestore_client(key_file: str) -> firestore.AsyncClient:
+    client = _ASYNC_CLIENT_CACHE.get(key_file)
+    if client is None:
+        if os.path.exists(key_file):
+            client = firestore.AsyncClient.from_service_account_json(key_file)
+        else:
+            client = firestore.AsyncClient()
+        _ASYNC_CLIENT_CACHE[key_file] = client
+    return client
+
+
+def _get_storage_client(key_file: str):
+    from google.cloud import storage
+    client = _STORAGE_CLIENT_CACHE.get(key_file)
+    if client is None:
+        if os.path.exists(key_file):
+            client = storage.Client.from_service_account_json(key_file)
+            logger.info(f"✅ GCP Storage client initialized with service account: {key_file}")
+        else:
+            # Use default credentials (for Cloud Run)
+            client = storage.Client()
+            logger.info("✅ GCP Storage client initialized with default credentials (Cloud Run)")
+        _STORAGE_CLIENT_CACHE[key_file] = client
+    return client
+
 
 class FirestoreManager:
     def __init__(self):
-        # Initialize Firestore client
+        # Try service account JSON first (for local development)
+        key_file = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "board-sync-466501-c38a2cead941.json")
+
+        # Initialize Firestore client (shared across instances)
         try:
-            # Try service account JSON first (for local development)
-            import os
-            key_file = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "board-sync-466501-c38a2cead941.json")
-            if os.path.exists(key_file):
-                self.db = firestore.Client.from_service_account_json(key_file)
-                print(f"✅ Firestore client initialized with service account: {key_file}")
-            else:
-                # Use default credentials (for Cloud Run)
-                self.db = firestore.Client()
-                print("✅ Firestore client initialized with default credentials (Cloud Run)")
+            self.db = _get_firestore_client(key_file)
         except Exception as e:
-            print(f"❌ Failed to initialize Firestore client: {e}")
+            logger.error(f"❌ Failed to initialize Firestore client: {e}")
             self.db = None
-        
+
+        # Async Firestore client for parallel read fan-out (cleanup scans)
+        try:
+            self.async_db = _get_async_firestore_client(key_file)
+        except Exception as e:
+            logger.warning(f"⚠️ Async Firestore client not available: {e}")
+            self.async_db = None
+
         # Initialize GCP Storage client (optional)
         try:
-            from google.cloud import storage
-            # Try service account JSON first (for local development)
-            if os.path.exists(key_file):
-                self.storage_client = storage.Client.from_service_account_json(key_file)
-                print(f"✅ GCP Storage client initialized with service account: {key_file}")
-            else:
-                # Use default credentials (for Cloud Run)
-                self.storage_client = storage.Client()
-                print("✅ GCP Storage client initialized with default credentials (Cloud Run)")
+            self.storage_client = _get_storage_client(key_file)
         except Exception as e:
-            print(f"⚠️ GCP Storage client not available: {e}")
+            logger.warning(f"⚠️ GCP Storage client not available: {e}")
             self.storage_client = None
 
+        # Cache the hot top-level collection refs; rebuilding them allocates a
+        # fresh reference object on every call
+        self._rooms = self.db.collection('rooms') if self.db else None
+        self._global_users = self.db.collection('global_users') if self.db else None
+
+        # Short-TTL cache of known-existing rooms so hot paths
+        # (add/remove user, chat bursts) skip the room_ref.get() round-trip
+        self._room_exists_cache: Dict[str, datetime] = {}  # room_id -> cache expiry
+        self._room_exists_ttl = timedelta(seconds=60)
+
+        # Object names attached per room during this process's lifetime,
+        # deduped at save time and merged into room cleanup
+        self._file_urls_per_room: Dict[str, set] = defaultdict(set)
+
+    @property
+    def rooms(self):
+        """Memoized top-level 'rooms' collection reference"""
+        return self._rooms
+
+    @property
+    def global_users(self):
+        """Memoized top-level 'global_users' collection reference"""
+        return self._global_users
+
+    def _run_async(self, coro):
+        """Run a coroutine on the dedicated async-client loop and wait for it.
+
+        Every AsyncClient RPC must land on the same loop the client's gRPC
+        channel was created on, so coroutines are handed to the long-lived
+        loop from _get_async_loop() rather than a throwaway asyncio.run
+        loop. Safe from sync code and from worker threads alike; the only
+        thread that must not call it is the dedicated loop's own.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, _get_async_loop()).result()
+
+    async def _gather_referenced_files(self) -> set:
+        """Collect every referenced object name across all rooms in one collection-group stream"""
+        referenced_files = set()
+        # Filter server-side so messages without a file never cross the wire
+        q = (self.async_db.collection_group('messages')
+             .where(filter=FieldFilter('file_url', '!=', None))
+             .select(['file_url']))
+        async for doc in q.stream():
+            file_url = doc.to_dict().get('file_url')
+            if file_url:
+                referenced_files.add(file_url.removeprefix(_FILES_URL_PREFIX))
+        return referenced_files
+
+    async def _sweep_orphan_candidates(self, stale_cutoff: datetime):
+        """Run the four independent cleanup scans concurrently, reading each collection once.
+
+        The global-users scan is filtered server-side to users already stale
+        at stale_cutoff, so only deletion candidates cross the wire.
+        """
+        async def to_list(aiter):
+            return [doc async for doc in aiter]
+
+        messages_q = (self.async_db.collection_group('messages')
+                      .where(filter=FieldFilter('file_url', '!=', None))
+                      .select(['file_url']))
+        # Only document refs are needed for users ('__name__' — an empty
+        # field list is a no-op that returns full documents), and only the
+        # activity fields for rooms — project away the rest of the payload
+        users_q = self.async_db.collection_group('users').select(['__name__'])
+        rooms_q = self.async_db.collection('rooms').select(['is_active', 'user_count'])
+        global_users_q = (self.async_db.collection('global_users')
+                          .where(filter=FieldFilter('is_online', '==', False))
+                          .where(filter=FieldFilter('last_seen', '<', stale_cutoff))
+                          .select(['username']))
+
+        return await asyncio.gather(
+            to_list(messages_q.stream()),
+            to_list(users_q.stream()),
+            to_list(rooms_q.stream()),
+            to_list(global_users_q.stream()),
+        )
+
+    def _delete_refs_in_batches(self, refs: List[Any], final_update: Optional[tuple] = None) -> int:
+        """Delete document references in WriteBatch chunks of 500 instead of one RPC per doc.
+
+        final_update is an optional (doc_ref, fields) pair committed in the same
+        batch as the last delete chunk so the status flip is atomic with it.
+        """
+        BATCH_SIZE = 500  # Firestore WriteBatch limit
+        deleted = 0
+        chunks = [refs[i:i + BATCH_SIZE] for i in range(0, len(refs), BATCH_SIZE)] or [[]]
+        for i, chunk in enumerate(chunks):
+            batch = self.db.batch()
+            for ref in chunk:
+                batch.delete(ref)
+                deleted += 1
+            # Fold the final update into the last chunk's commit
+            if final_update and i == len(chunks) - 1:
+                batch.update(final_update[0], final_update[1])
+            if chunk or (final_update and i == len(chunks) - 1):
+                batch.commit()
+        return deleted
+
+    def _update_refs_in_batches(self, updates: List[tuple]) -> int:
+        """Apply (doc_ref, fields) updates in WriteBatch chunks of 500.
+
+        Companion to _delete_refs_in_batches for update-heavy cleanup loops:
+        one commit RPC per 500 mutations instead of one per document.
+        """
+        BATCH_SIZE = 500  # Firestore WriteBatch limit
+        updated = 0
+        for i in range(0, len(updates), BATCH_SIZE):
+            batch = self.db.batch()
+            for ref, fields in updates[i:i + BATCH_SIZE]:
+                batch.update(ref, fields)
+                updated += 1
+            batch.commit()
+        return updated
+
     def is_username_available_globally(self, username: str, exclude_user_id: str = None) -> bool:
         """Check if a username is available globally across all rooms"""
         if not self.db:
@@ -44,7 +262,7 @@ class FirestoreManager:
         
         try:
             # Check in global users collection
-            global_user_ref = self.db.collection('global_users').document(username)
+            global_user_ref = self._global_users.document(username)
             global_user = global_user_ref.get()
             
             if global_user.exists:
@@ -63,29 +281,29 @@ class FirestoreManager:
                 if is_online:
                     return False
                 
-                # If user hasn't been seen recently (within 2 minutes), username is available
+                # If user hasn't been seen recently (within 2 minutes), username is
+                # available. last_seen comes back as a UTC-aware Timestamp, so
+                # compare directly — no attribute probing or tz normalization.
                 if last_seen:
-                    from datetime import timedelta
-                    if hasattr(last_seen, 'timestamp'):
-                        time_diff = datetime.now() - last_seen
-                        if time_diff > timedelta(minutes=2):
-                            # User has been offline for more than 2 minutes, username is available
-                            print(f"Username {username} is available (user offline for {time_diff.total_seconds():.0f}s)")
-                            return True
-                        else:
-                            # User was seen recently, username is still taken
-                            print(f"Username {username} is taken (user seen {time_diff.total_seconds():.0f}s ago)")
-                            return False
+                    time_diff = datetime.now(timezone.utc) - last_seen
+                    if time_diff > timedelta(minutes=2):
+                        # User has been offline for more than 2 minutes, username is available
+                        logger.debug(f"Username {username} is available (user offline for {time_diff.total_seconds():.0f}s)")
+                        return True
+                    else:
+                        # User was seen recently, username is still taken
+                        logger.debug(f"Username {username} is taken (user seen {time_diff.total_seconds():.0f}s ago)")
+                        return False
                 
                 # If no last_seen timestamp, assume username is available
-                print(f"Username {username} is available (no last_seen timestamp)")
+                logger.debug(f"Username {username} is available (no last_seen timestamp)")
                 return True
             
             # Username not found in global users, so it's available
-            print(f"Username {username} is available (not registered)")
+            logger.debug(f"Username {username} is available (not registered)")
             return True
         except Exception as e:
-            print(f"Error checking global username availability: {e}")
+            logger.error(f"Error checking global username availability: {e}")
             return True
 
     def register_global_user(self, username: str, user_id: str, room_id: str) -> bool:
@@ -94,20 +312,21 @@ class FirestoreManager:
             return False
         
         try:
-            global_user_ref = self.db.collection('global_users').document(username)
+            now = datetime.now(timezone.utc)
+            global_user_ref = self._global_users.document(username)
             global_user_data = {
                 'user_id': user_id,
                 'username': username,
                 'room_id': room_id,
                 'is_online': True,
-                'last_seen': datetime.now(),
-                'registered_at': datetime.now()
+                'last_seen': now,
+                'registered_at': now
             }
             global_user_ref.set(global_user_data)
-            print(f"Registered global user: {username} (ID: {user_id})")
+            logger.info(f"Registered global user: {username} (ID: {user_id})")
             return True
         except Exception as e:
-            print(f"Error registering global user: {e}")
+            logger.error(f"Error registering global user: {e}")
             return False
 
     def unregister_global_user(self, username: str) -> bool:
@@ -116,12 +335,12 @@ class FirestoreManager:
             return False
         
         try:
-            global_user_ref = self.db.collection('global_users').document(username)
+            global_user_ref = self._global_users.document(username)
             global_user_ref.delete()
-            print(f"Unregistered global user: {username}")
+            logger.info(f"Unregistered global user: {username}")
             return True
         except Exception as e:
-            print(f"Error unregistering global user: {e}")
+            logger.error(f"Error unregistering global user: {e}")
             return False
 
     def update_global_user_status(self, username: str, is_online: bool = True) -> bool:
@@ -130,27 +349,38 @@ class FirestoreManager:
             return False
         
         try:
-            global_user_ref = self.db.collection('global_users').document(username)
+            global_user_ref = self._global_users.document(username)
             global_user_ref.update({
                 'is_online': is_online,
-                'last_seen': datetime.now()
+                'last_seen': datetime.now(timezone.utc)
             })
             return True
         except Exception as e:
-            print(f"Error updating global user status: {e}")
+            logger.error(f"Error updating global user status: {e}")
             return False
 
+    def _room_exists_cached(self, room_id: str) -> bool:
+        """Check room existence, caching positive results for a short TTL"""
+        expiry = self._room_exists_cache.get(room_id)
+        if expiry and expiry > datetime.now(timezone.utc):
+            return True
+
+        room_ref = self._rooms.document(room_id)
+        room_doc = room_ref.get()
+        if room_doc.exists:
+            self._room_exists_cache[room_id] = datetime.now(timezone.utc) + self._room_exists_ttl
+            return True
+        return False
+
     def room_exists(self, room_id: str) -> bool:
         """Check if a room exists in Firestore"""
         if not self.db:
             return False
-        
+
         try:
-            room_ref = self.db.collection('rooms').document(room_id)
-            room_doc = room_ref.get()
-            return room_doc.exists
+            return self._room_exists_cached(room_id)
         except Exception as e:
-            print(f"Error checking if room exists: {e}")
+            logger.error(f"Error checking if room exists: {e}")
             return False
 
     def create_room(self, room_name: str, created_by: str) -> str:
@@ -159,19 +389,21 @@ class FirestoreManager:
             return None
         
         try:
-            room_ref = self.db.collection('rooms').document()
+            now = datetime.now(timezone.utc)
+            room_ref = self._rooms.document()
             room_data = {
                 'name': room_name,
                 'created_by': created_by,
-                'created_at': datetime.now(),
-                'last_activity': datetime.now(),
+                'created_at': now,
+                'last_activity': now,
                 'user_count': 0,
                 'is_active': True
             }
             room_ref.set(room_data)
+            self._room_exists_cache[room_ref.id] = datetime.now(timezone.utc) + self._room_exists_ttl
             return room_ref.id
         except Exception as e:
-            print(f"Error creating room: {e}")
+            logger.error(f"Error creating room: {e}")
             return None
 
     def create_room_with_id(self, room_id: str, room_name: str, created_by: str) -> bool:
@@ -180,20 +412,22 @@ class FirestoreManager:
             return False
         
         try:
-            room_ref = self.db.collection('rooms').document(room_id)
+            now = datetime.now(timezone.utc)
+            room_ref = self._rooms.document(room_id)
             room_data = {
                 'name': room_name,
                 'created_by': created_by,
-                'created_at': datetime.now(),
-                'last_activity': datetime.now(),
+                'created_at': now,
+                'last_activity': now,
                 'user_count': 0,
                 'is_active': True
             }
             room_ref.set(room_data)
-            print(f"✅ Created room {room_id} in Firestore")
+            self._room_exists_cache[room_id] = datetime.now(timezone.utc) + self._room_exists_ttl
+            logger.info(f"✅ Created room {room_id} in Firestore")
             return True
         except Exception as e:
-            print(f"Error creating room with ID: {e}")
+            logger.error(f"Error creating room with ID: {e}")
             return False
 
     def get_all_rooms(self) -> List[Dict[str, Any]]:
@@ -203,7 +437,7 @@ class FirestoreManager:
         
         try:
             rooms = []
-            rooms_ref = self.db.collection('rooms').where('is_active', '==', True)
+            rooms_ref = self._rooms.where('is_active', '==', True)
             for room in rooms_ref.stream():
                 room_data = room.to_dict()
                 room_data['id'] = room.id
@@ -217,7 +451,7 @@ class FirestoreManager:
                 rooms.append(room_data)
             return rooms
         except Exception as e:
-            print(f"Error getting rooms: {e}")
+            logger.error(f"Error getting rooms: {e}")
             return []
 
     def add_user_to_room(self, room_id: str, user_id: str, user_name: str) -> bool:
@@ -226,46 +460,47 @@ class FirestoreManager:
             return False
         
         try:
-            # First check if room exists
-            room_ref = self.db.collection('rooms').document(room_id)
-            room_doc = room_ref.get()
-            
-            if not room_doc.exists:
-                print(f"❌ Room {room_id} doesn't exist in Firestore. Cannot add user.")
+            # First check if room exists (cached to skip repeated RPCs)
+            if not self._room_exists_cached(room_id):
+                logger.error(f"❌ Room {room_id} doesn't exist in Firestore. Cannot add user.")
                 return False
-            
+
+            now = datetime.now(timezone.utc)
+            room_ref = self._rooms.document(room_id)
+
             # Check if user already exists in this room
-            user_ref = self.db.collection('rooms').document(room_id).collection('users').document(user_id)
+            user_ref = room_ref.collection('users').document(user_id)
             existing_user = user_ref.get()
-            
+
             if existing_user.exists:
                 # User already exists, just update online status
                 user_ref.update({
                     'is_online': True,
-                    'last_seen': datetime.now()
+                    'last_seen': now
                 })
-                print(f"User {user_name} already exists in room {room_id}, updated online status")
+                logger.info(f"User {user_name} already exists in room {room_id}, updated online status")
                 return True
-            
+
             # Add new user to room's users subcollection
             user_data = {
                 'name': user_name,
-                'joined_at': datetime.now(),
+                # Precomputed so readers never re-derive it from the prefix
+                'is_auto': user_name.startswith("User ") if user_name else False,
+                'joined_at': now,
                 'is_online': True,
-                'last_seen': datetime.now()
+                'last_seen': now
             }
             user_ref.set(user_data)
-            
+
             # Update room's user count
-            room_ref = self.db.collection('rooms').document(room_id)
             room_ref.update({
                 'user_count': firestore.Increment(1),
-                'last_activity': datetime.now()
+                'last_activity': now
             })
-            print(f"Added new user {user_name} to room {room_id}")
+            logger.info(f"Added new user {user_name} to room {room_id}")
             return True
         except Exception as e:
-            print(f"Error adding user to room: {e}")
+            logger.error(f"Error adding user to room: {e}")
             return False
 
     def remove_user_from_room(self, room_id: str, user_id: str) -> bool:
@@ -274,20 +509,19 @@ class FirestoreManager:
             return False
         
         try:
-            # First check if room exists
-            room_ref = self.db.collection('rooms').document(room_id)
-            room_doc = room_ref.get()
-            
-            if not room_doc.exists:
-                print(f"⚠️ Room {room_id} doesn't exist in Firestore, skipping user removal")
+            # First check if room exists (cached to skip repeated RPCs)
+            if not self._room_exists_cached(room_id):
+                logger.warning(f"⚠️ Room {room_id} doesn't exist in Firestore, skipping user removal")
                 return True  # Return True to avoid error cascading
+
+            room_ref = self._rooms.document(room_id)
             
             # Get user data before removing
-            user_ref = self.db.collection('rooms').document(room_id).collection('users').document(user_id)
+            user_ref = room_ref.collection('users').document(user_id)
             user_doc = user_ref.get()
             
             if not user_doc.exists:
-                print(f"⚠️ User {user_id} not found in room {room_id}")
+                logger.warning(f"⚠️ User {user_id} not found in room {room_id}")
                 return True  # Return True to avoid error cascading
             
             user_data = user_doc.to_dict()
@@ -299,13 +533,13 @@ class FirestoreManager:
             # Update room's user count
             room_ref.update({
                 'user_count': firestore.Increment(-1),
-                'last_activity': datetime.now()
+                'last_activity': datetime.now(timezone.utc)
             })
             
-            print(f"Removed user {user_name} (ID: {user_id}) from room {room_id}")
+            logger.info(f"Removed user {user_name} (ID: {user_id}) from room {room_id}")
             return True
         except Exception as e:
-            print(f"Error removing user from room: {e}")
+            logger.error(f"Error removing user from room: {e}")
             return False
 
     def save_chat_message(self, room_id: str, user_id: str, user_name: str, message: str, 
@@ -316,20 +550,62 @@ class FirestoreManager:
             return False
         
         try:
-            message_ref = self.db.collection('rooms').document(room_id).collection('messages').document()
+            message_ref = self._rooms.document(room_id).collection('messages').document()
             message_data = {
                 'user_id': user_id,
                 'user_name': user_name,
                 'message': message,
-                'timestamp': datetime.now(),
+                'timestamp': datetime.now(timezone.utc),
                 'file_url': file_url,
                 'file_name': file_name,
                 'file_type': file_type
             }
             message_ref.set(message_data)
+
+            # Remember the attachment for this room (deduped set) so cleanup
+            # can merge it without re-reading the message
+            if file_url and file_url.startswith(_FILES_URL_PREFIX):
+                self._file_urls_per_room[room_id].add(file_url.removeprefix(_FILES_URL_PREFIX))
+
+            return True
+        except Exception as e:
+            logger.error(f"Error saving chat message: {e}")
+            return False
+
+    def save_chat_messages(self, items: List[Dict[str, Any]]) -> bool:
+        """Save several chat messages in one batched commit.
+
+        Each item carries room_id plus the same fields save_chat_message
+        takes; a WriteBatch turns N messages into a single round-trip.
+        """
+        if not self.db or not items:
+            return False
+        
+        try:
+            batch = self.db.batch()
+            now = datetime.now(timezone.utc)
+            for item in items:
+                room_id = item['room_id']
+                message_ref = self._rooms.document(room_id).collection('messages').document()
+                batch.set(message_ref, {
+                    'user_id': item.get('user_id'),
+                    'user_name': item.get('user_name'),
+                    'message': item.get('message'),
+                    # Arrival time stamped at enqueue; falling back to batch
+                    # time would make same-flush messages order-ambiguous
+                    # under get_room_messages' timestamp sort
+                    'timestamp': item.get('timestamp', now),
+                    'file_url': item.get('file_url'),
+                    'file_name': item.get('file_name'),
+                    'file_type': item.get('file_type')
+                })
+                file_url = item.get('file_url')
+                if file_url and file_url.startswith(_FILES_URL_PREFIX):
+                    self._file_urls_per_room[room_id].add(file_url.removeprefix(_FILES_URL_PREFIX))
+            batch.commit()
             return True
         except Exception as e:
-            print(f"Error saving chat message: {e}")
+            logger.error(f"Error saving chat message batch: {e}")
             return False
 
     def get_room_messages(self, room_id: str, limit: int = 50) -> List[Dict[str, Any]]:
@@ -339,14 +615,21 @@ class FirestoreManager:
         
         try:
             messages = []
-            messages_ref = self.db.collection('rooms').document(room_id).collection('messages').order_by('timestamp', direction=firestore.Query.DESCENDING).limit(limit)
-            for message in messages_ref.stream():
+            # Ascending order + limit_to_last returns the newest `limit` messages
+            # already in chronological order (no reversed() copy), and the
+            # projection only transfers the fields the UI renders
+            messages_ref = (self._rooms.document(room_id).collection('messages')
+                            .select(['user_id', 'user_name', 'message', 'timestamp',
+                                     'file_url', 'file_name', 'file_type'])
+                            .order_by('timestamp')
+                            .limit_to_last(limit))
+            for message in messages_ref.get():
                 message_data = message.to_dict()
                 message_data['id'] = message.id
                 messages.append(message_data)
-            return list(reversed(messages))  # Return in chronological order
+            return messages
         except Exception as e:
-            print(f"Error getting room messages: {e}")
+            logger.error(f"Error getting room messages: {e}")
             return []
 
     def save_canvas_state(self, room_id: str, drawings: List[Dict[str, Any]]) -> bool:
@@ -355,15 +638,39 @@ class FirestoreManager:
             return False
         
         try:
-            canvas_ref = self.db.collection('rooms').document(room_id).collection('canvas').document('current')
+            canvas_ref = self._rooms.document(room_id).collection('canvas').document('current')
             canvas_data = {
                 'drawings': drawings,
-                'updated_at': datetime.now()
+                # Denormalized so stats endpoints can read one small field
+                # instead of shipping the whole drawings array
+                'stroke_count': len(drawings),
+                'updated_at': datetime.now(timezone.utc)
             }
             canvas_ref.set(canvas_data)
             return True
         except Exception as e:
-            print(f"Error saving canvas state: {e}")
+            logger.error(f"Error saving canvas state: {e}")
+            return False
+
+    def append_canvas_strokes(self, room_id: str, strokes: List[Dict[str, Any]]) -> bool:
+        """Append strokes to the canvas document without rewriting the array.
+
+        ArrayUnion sends only the new strokes over the wire, so the write
+        cost stays O(new strokes) instead of O(total strokes) per save.
+        """
+        if not self.db:
+            return False
+
+        try:
+            canvas_ref = self._rooms.document(room_id).collection('canvas').document('current')
+            canvas_ref.set({
+                'drawings': firestore.ArrayUnion(strokes),
+                'stroke_count': firestore.Increment(len(strokes)),
+                'updated_at': datetime.now(timezone.utc)
+            }, merge=True)
+            return True
+        except Exception as e:
+            logger.error(f"Error appending canvas strokes: {e}")
             return False
 
     def get_canvas_state(self, room_id: str) -> List[Dict[str, Any]]:
@@ -372,14 +679,14 @@ class FirestoreManager:
             return []
         
         try:
-            canvas_ref = self.db.collection('rooms').document(room_id).collection('canvas').document('current')
+            canvas_ref = self._rooms.document(room_id).collection('canvas').document('current')
             canvas_doc = canvas_ref.get()
             if canvas_doc.exists:
                 canvas_data = canvas_doc.to_dict()
                 return canvas_data.get('drawings', [])
             return []
         except Exception as e:
-            print(f"Error getting canvas state: {e}")
+            logger.error(f"Error getting canvas state: {e}")
             return []
 
     def update_user_name(self, room_id: str, user_id: str, new_name: str) -> bool:
@@ -388,14 +695,15 @@ class FirestoreManager:
             return False
         
         try:
-            user_ref = self.db.collection('rooms').document(room_id).collection('users').document(user_id)
+            user_ref = self._rooms.document(room_id).collection('users').document(user_id)
             user_ref.update({
                 'name': new_name,
-                'updated_at': datetime.now()
+                'is_auto': new_name.startswith("User ") if new_name else False,
+                'updated_at': datetime.now(timezone.utc)
             })
             return True
         except Exception as e:
-            print(f"Error updating user name: {e}")
+            logger.error(f"Error updating user name: {e}")
             return False
 
     def get_room_users(self, room_id: str) -> List[Dict[str, Any]]:
@@ -405,14 +713,19 @@ class FirestoreManager:
         
         try:
             users = []
-            users_ref = self.db.collection('rooms').document(room_id).collection('users')
+            users_ref = self._rooms.document(room_id).collection('users')
             for user in users_ref.stream():
                 user_data = user.to_dict()
                 user_data['id'] = user.id
+                # Normalize joined_at to an ISO string here so consumers can
+                # serialize the dicts as-is instead of type-sniffing each one
+                joined_at = user_data.get('joined_at')
+                if joined_at is not None and not isinstance(joined_at, str):
+                    user_data['joined_at'] = joined_at.isoformat()
                 users.append(user_data)
             return users
         except Exception as e:
-            print(f"Error getting room users: {e}")
+            logger.error(f"Error getting room users: {e}")
             return []
 
     def cleanup_auto_generated_users(self) -> int:
@@ -421,49 +734,42 @@ class FirestoreManager:
             return 0
         
         try:
-            total_removed = 0
-            
-            # Get all rooms
-            rooms_ref = self.db.collection('rooms')
-            rooms = list(rooms_ref.stream())
-            
-            for room in rooms:
-                room_id = room.id
-                print(f"Cleaning up room: {room_id}")
-                
-                # Get all users in this room
-                users_ref = self.db.collection('rooms').document(room_id).collection('users')
-                users = list(users_ref.stream())
-                
-                removed_count = 0
-                for user in users:
-                    user_data = user.to_dict()
-                    user_name = user_data.get('name', '')
-                    
-                    # Check if this is an auto-generated user
-                    if user_name.startswith('User '):
-                        print(f"  Removing auto-generated user: {user_name}")
-                        user.reference.delete()
-                        removed_count += 1
-                
-                total_removed += removed_count
-                
-                # Update room user count
-                if removed_count > 0:
-                    room_ref = self.db.collection('rooms').document(room_id)
-                    current_count = room.to_dict().get('user_count', 0)
-                    new_count = max(0, current_count - removed_count)
-                    room_ref.update({
-                        'user_count': new_count,
-                        'last_activity': datetime.now()
-                    })
-                    print(f"  Updated room {room_id} user count: {current_count} -> {new_count}")
-            
-            print(f"Cleanup completed: removed {total_removed} auto-generated users")
+            # One collection-group query finds every auto-generated user across
+            # all rooms; the 'User ' prefix range replaces the client-side
+            # startswith check so only matches are transferred
+            users_query = (self.db.collection_group('users')
+                           .where(filter=FieldFilter('name', '>=', 'User '))
+                           .where(filter=FieldFilter('name', '<', 'User!')))
+
+            refs_to_delete = []
+            removed_by_room: Dict[str, int] = {}
+            # Hoist the level check so the per-user f-string isn't built
+            # when debug logging is off
+            debug_enabled = logger.isEnabledFor(logging.DEBUG)
+            for user in users_query.stream():
+                user_name = user.to_dict().get('name', '')
+                room_id = user.reference.parent.parent.id
+                if debug_enabled:
+                    logger.debug(f"  Removing auto-generated user: {user_name} (room {room_id})")
+                refs_to_delete.append(user.reference)
+                removed_by_room[room_id] = removed_by_room.get(room_id, 0) + 1
+
+            total_removed = self._delete_refs_in_batches(refs_to_delete)
+
+            # Decrement each affected room's user count without a read
+            for room_id, count in removed_by_room.items():
+                room_ref = self._rooms.document(room_id)
+                room_ref.update({
+                    'user_count': firestore.Increment(-count),
+                    'last_activity': firestore.SERVER_TIMESTAMP
+                })
+                logger.info(f"  Updated room {room_id} user count: -{count}")
+
+            logger.info(f"Cleanup completed: removed {total_removed} auto-generated users")
             return total_removed
-            
+
         except Exception as e:
-            print(f"Error during cleanup: {e}")
+            logger.error(f"Error during cleanup: {e}")
             return 0
 
     def remove_duplicate_users(self, room_id: str) -> int:
@@ -472,43 +778,40 @@ class FirestoreManager:
             return 0
         
         try:
-            users_ref = self.db.collection('rooms').document(room_id).collection('users')
+            users_ref = self._rooms.document(room_id).collection('users')
             users = list(users_ref.stream())
             
             # Group users by name
-            users_by_name = {}
+            users_by_name = defaultdict(list)
             for user in users:
-                user_data = user.to_dict()
-                user_name = user_data.get('name', '')
-                
-                if user_name not in users_by_name:
-                    users_by_name[user_name] = []
+                user_name = user.to_dict().get('name', '')
                 users_by_name[user_name].append(user)
-            
-            removed_count = 0
+
+            refs_to_delete = []
             for user_name, user_list in users_by_name.items():
                 if len(user_list) > 1:
-                    # Keep the first user, remove the rest
+                    # Keep the earliest-joined user (the canonical one), remove the rest
+                    user_list.sort(key=lambda u: u.to_dict().get('joined_at')
+                                   or datetime.max.replace(tzinfo=timezone.utc))
                     for user in user_list[1:]:
-                        print(f"Removing duplicate user: {user_name} (ID: {user.id})")
-                        user.reference.delete()
-                        removed_count += 1
-            
-            # Update room user count
+                        logger.debug(f"Removing duplicate user: {user_name} (ID: {user.id})")
+                        refs_to_delete.append(user.reference)
+
+            removed_count = self._delete_refs_in_batches(refs_to_delete)
+
+            # Update room user count via Increment — no read-modify-write round-trip
             if removed_count > 0:
-                room_ref = self.db.collection('rooms').document(room_id)
-                current_count = room_ref.get().to_dict().get('user_count', 0)
-                new_count = max(0, current_count - removed_count)
+                room_ref = self._rooms.document(room_id)
                 room_ref.update({
-                    'user_count': new_count,
-                    'last_activity': datetime.now()
+                    'user_count': firestore.Increment(-removed_count),
+                    'last_activity': datetime.now(timezone.utc)
                 })
-                print(f"Updated room {room_id} user count: {current_count} -> {new_count}")
+                logger.info(f"Updated room {room_id} user count: -{removed_count}")
             
             return removed_count
             
         except Exception as e:
-            print(f"Error removing duplicate users: {e}")
+            logger.error(f"Error removing duplicate users: {e}")
             return 0
 
     def cleanup_global_users(self) -> int:
@@ -517,41 +820,25 @@ class FirestoreManager:
             return 0
         
         try:
-            removed_count = 0
-            global_users_ref = self.db.collection('global_users')
-            global_users = list(global_users_ref.stream())
-            
-            from datetime import timedelta
-            cutoff_time = datetime.now() - timedelta(minutes=10)  # Remove users offline for 10+ minutes
-            
-            for user in global_users:
-                user_data = user.to_dict()
-                username = user_data.get('username')
-                is_online = user_data.get('is_online', False)
-                last_seen = user_data.get('last_seen')
-                
-                # Remove if user is offline and hasn't been seen recently
-                if not is_online and last_seen:
-                    # Handle both timezone-aware and timezone-naive datetimes
-                    if hasattr(last_seen, 'replace'):
-                        # Convert to timezone-naive datetime for comparison
-                        if hasattr(last_seen, 'tzinfo') and last_seen.tzinfo is not None:
-                            # Timezone-aware datetime, convert to naive
-                            last_seen_naive = last_seen.replace(tzinfo=None)
-                        else:
-                            # Already timezone-naive
-                            last_seen_naive = last_seen
-                        
-                        if last_seen_naive < cutoff_time:
-                            print(f"Removing stale global user: {username} (offline since {last_seen})")
-                            user.reference.delete()
-                            removed_count += 1
-            
-            print(f"Cleanup completed: removed {removed_count} stale global users")
+            cutoff_time = datetime.now(timezone.utc) - timedelta(minutes=10)  # Remove users offline for 10+ minutes
+
+            # Filter server-side on the (is_online, last_seen) composite index;
+            # projecting '__name__' returns just the matching document refs
+            stale_query = (self._global_users
+                           .where(filter=FieldFilter('is_online', '==', False))
+                           .where(filter=FieldFilter('last_seen', '<', cutoff_time))
+                           .select(['__name__']))
+            refs_to_delete = []
+            for user in stale_query.stream():
+                logger.debug(f"Removing stale global user: {user.id}")
+                refs_to_delete.append(user.reference)
+
+            removed_count = self._delete_refs_in_batches(refs_to_delete)
+            logger.info(f"Cleanup completed: removed {removed_count} stale global users")
             return removed_count
             
         except Exception as e:
-            print(f"Error during global user cleanup: {e}")
+            logger.error(f"Error during global user cleanup: {e}")
             return 0
 
     def cleanup_room_data(self, room_id: str) -> bool:
@@ -560,82 +847,94 @@ class FirestoreManager:
             return False
         
         try:
-            print(f"🧹 Firestore cleanup: {room_id}")
-            
+            logger.info(f"🧹 Firestore cleanup: {room_id}")
+
+            # Drop any cached existence entry; the room is going away
+            self._room_exists_cache.pop(room_id, None)
+
             # First check if room exists
-            room_ref = self.db.collection('rooms').document(room_id)
+            room_ref = self._rooms.document(room_id)
             room_doc = room_ref.get()
             
             if not room_doc.exists:
-                print(f"⚠️ Room {room_id} doesn't exist in Firestore, nothing to clean up")
+                logger.warning(f"⚠️ Room {room_id} doesn't exist in Firestore, nothing to clean up")
                 return True
             
-            # Get all file URLs from this room before deleting messages
+            # Get all file URLs from this room before deleting messages.
+            # The filtered + projected query only transfers file-bearing messages;
+            # the full stream below is still needed to collect delete refs.
             room_files = set()
-            messages_ref = self.db.collection('rooms').document(room_id).collection('messages')
+            messages_ref = room_ref.collection('messages')
+            files_query = (messages_ref
+                           .where(filter=FieldFilter('file_url', '!=', None))
+                           .select(['file_url']))
+            for message in files_query.stream():
+                file_url = message.to_dict().get('file_url')
+                if file_url and file_url.startswith(_FILES_URL_PREFIX):
+                    # Store the object name, not the full URL
+                    room_files.add(file_url.removeprefix(_FILES_URL_PREFIX))
+
+            # Merge attachments recorded at save time in this process
+            room_files |= self._file_urls_per_room.pop(room_id, set())
+
             messages_docs = list(messages_ref.stream())
             
-            for message in messages_docs:
-                message_data = message.to_dict()
-                file_url = message_data.get('file_url')
-                if file_url:
-                    room_files.add(file_url)
-            
-            # Clean up canvas data
-            canvas_ref = self.db.collection('rooms').document(room_id).collection('canvas')
-            canvas_docs = list(canvas_ref.stream())
-            for doc in canvas_docs:
-                doc.reference.delete()
-            
-            # Clean up messages
-            for doc in messages_docs:
-                doc.reference.delete()
-            
-            # Clean up users
-            users_ref = self.db.collection('rooms').document(room_id).collection('users')
-            users_docs = list(users_ref.stream())
-            for doc in users_docs:
-                doc.reference.delete()
-            
-            # Update room status to inactive
-            room_ref.update({
+            # Collect canvas, message and user refs, then delete in batches
+            # (one RPC per 500 docs instead of one RPC per doc)
+            canvas_docs = list(room_ref.collection('canvas').stream())
+
+            # Skip the users listing when the room already reports zero users;
+            # a limit(1) probe confirms the counter before trusting it, so a
+            # stale count can't leave stray user docs behind
+            users_ref = room_ref.collection('users')
+            if room_doc.to_dict().get('user_count', 0) == 0 and self._is_empty(users_ref):
+                users_docs = []
+            else:
+                users_docs = list(users_ref.stream())
+
+            refs_to_delete = [doc.reference for doc in canvas_docs]
+            refs_to_delete.extend(doc.reference for doc in messages_docs)
+            refs_to_delete.extend(doc.reference for doc in users_docs)
+
+            # The room status flip rides in the last delete batch
+            self._delete_refs_in_batches(refs_to_delete, final_update=(room_ref, {
                 'is_active': False,
-                'cleaned_up_at': datetime.now(),
+                'cleaned_up_at': datetime.now(timezone.utc),
                 'user_count': 0
-            })
+            }))
             
-            print(f"✅ Firestore cleaned: {room_id} ({len(canvas_docs)} canvas, {len(messages_docs)} messages, {len(users_docs)} users)")
+            logger.info(f"✅ Firestore cleaned: {room_id} ({len(canvas_docs)} canvas, {len(messages_docs)} messages, {len(users_docs)} users)")
             
             # Clean up GCP files associated with this room
             if room_files and hasattr(self, 'storage_client') and self.storage_client is not None:
                 try:
-                    bucket_name = "board-sync-466501.appspot.com"
-                    bucket = self.storage_client.bucket(bucket_name)
-                    
+                    bucket = self.storage_client.bucket(_FILES_BUCKET)
+
+                    # room_files already holds object names; delete through
+                    # client.batch() in groups of 100 (the GCS batch limit) —
+                    # one multipart request per group instead of one DELETE
+                    # per blob, the same idiom as StorageManager.delete_files
+                    names = list(room_files)
                     files_deleted = 0
-                    for file_url in room_files:
-                        # Extract filename from URL
-                        if file_url.startswith(f"https://storage.googleapis.com/{bucket_name}/"):
-                            filename = file_url.replace(f"https://storage.googleapis.com/{bucket_name}/", "")
-                            try:
-                                blob = bucket.blob(filename)
-                                if blob.exists():
-                                    blob.delete()
-                                    print(f"  🗑️ Deleted room file: {filename}")
-                                    files_deleted += 1
-                            except Exception as e:
-                                print(f"  ⚠️ Error deleting file {filename}: {e}")
-                    
-                    print(f"✅ GCP files cleaned: {room_id} ({files_deleted} files deleted)")
+                    for start in range(0, len(names), 100):
+                        chunk = names[start:start + 100]
+                        try:
+                            with self.storage_client.batch():
+                                for name in chunk:
+                                    bucket.blob(name).delete()
+                            files_deleted += len(chunk)
+                        except Exception as e:
+                            logger.warning(f"  ⚠️ Could not delete a batch of {len(chunk)} files (already gone?): {e}")
+                    logger.info(f"✅ GCP files cleaned: {room_id} ({files_deleted} files deleted)")
                 except Exception as e:
-                    print(f"⚠️ GCP Storage cleanup skipped for room {room_id}: {e}")
+                    logger.warning(f"⚠️ GCP Storage cleanup skipped for room {room_id}: {e}")
             elif room_files:
-                print(f"⚠️ GCP Storage not configured, {len(room_files)} room files not cleaned up")
+                logger.warning(f"⚠️ GCP Storage not configured, {len(room_files)} room files not cleaned up")
             
             return True
             
         except Exception as e:
-            print(f"❌ Firestore cleanup error {room_id}: {e}")
+            logger.error(f"❌ Firestore cleanup error {room_id}: {e}")
             return False
 
     def cleanup_orphaned_files(self) -> int:
@@ -644,70 +943,125 @@ class FirestoreManager:
             return 0
         
         try:
-            print("🧹 Cleaning up orphaned files in GCP Storage")
+            logger.info("🧹 Cleaning up orphaned files in GCP Storage")
             
             # Get all file URLs from ALL rooms (not just active ones)
             # This prevents files from being orphaned when chat history isn't loaded
             referenced_files = set()
             
-            # Get file URLs from messages in ALL rooms
-            rooms_ref = self.db.collection('rooms')
-            rooms = list(rooms_ref.stream())
-            
-            total_rooms = 0
-            for room in rooms:
-                total_rooms += 1
-                room_id = room.id
-                messages_ref = self.db.collection('rooms').document(room_id).collection('messages')
-                messages = list(messages_ref.stream())
-                
-                for message in messages:
-                    message_data = message.to_dict()
-                    file_url = message_data.get('file_url')
+            # Get file URLs from messages in ALL rooms via one collection-group
+            # query instead of a fresh stream per room
+            if self.async_db:
+                referenced_files = self._run_async(self._gather_referenced_files())
+            else:
+                q = (self.db.collection_group('messages')
+                     .where(filter=FieldFilter('file_url', '!=', None))
+                     .select(['file_url']))
+                for doc in q.stream():
+                    file_url = doc.to_dict().get('file_url')
                     if file_url:
-                        referenced_files.add(file_url)
-            
-            print(f"Found {len(referenced_files)} referenced files in {total_rooms} total rooms")
-            
-            # Check if GCP Storage is configured
-            if not hasattr(self, 'storage_client') or self.storage_client is None:
-                print("⚠️ GCP Storage not configured, skipping file cleanup")
-                return 0
-            
-            # Get all files in GCP Storage bucket
-            try:
-                bucket_name = "board-sync-466501.appspot.com"
-                bucket = self.storage_client.bucket(bucket_name)
-                blobs = list(bucket.list_blobs())
-                
-                print(f"Found {len(blobs)} total files in GCP Storage")
-                
-                orphaned_count = 0
-                for blob in blobs:
-                    blob_url = f"https://storage.googleapis.com/{bucket_name}/{blob.name}"
-                    if blob_url not in referenced_files:
-                        print(f"  🗑️ Deleting orphaned file: {blob.name}")
-                        blob.delete()
-                        orphaned_count += 1
-                
-                print(f"✅ GCP Storage cleanup completed: removed {orphaned_count} orphaned files")
-                return orphaned_count
-                
-            except Exception as e:
-                print(f"⚠️ GCP Storage cleanup skipped (credentials issue): {e}")
-                return 0
-                
+                        referenced_files.add(file_url.removeprefix(_FILES_URL_PREFIX))
+
+            logger.info(f"Found {len(referenced_files)} referenced files across all rooms")
+
+            return self._delete_unreferenced_blobs(referenced_files)
+
+        except Exception as e:
+            logger.error(f"❌ Error cleaning up orphaned files: {e}")
+            return 0
+
+    def _delete_unreferenced_blobs(self, referenced_files: set) -> int:
+        """Diff the bucket listing against referenced object names and delete orphans"""
+        # Check if GCP Storage is configured
+        if not hasattr(self, 'storage_client') or self.storage_client is None:
+            logger.warning("⚠️ GCP Storage not configured, skipping file cleanup")
+            return 0
+
+        # Stream the bucket listing with a name-only projection and diff
+        # inline — no full blob objects materialized in memory
+        try:
+            bucket = self.storage_client.bucket(_FILES_BUCKET)
+            blobs_iter = bucket.list_blobs(fields='items(name),nextPageToken')
+
+            total_files = 0
+            orphaned_count = 0
+            pending = []
+            debug_enabled = logger.isEnabledFor(logging.DEBUG)
+
+            def flush_pending():
+                # One client.batch() per group — a single multipart request
+                # instead of one DELETE per blob
+                nonlocal orphaned_count
+                try:
+                    with self.storage_client.batch():
+                        for blob in pending:
+                            blob.delete()
+                    orphaned_count += len(pending)
+                except Exception as e:
+                    logger.warning(f"  ⚠️ Could not delete a batch of {len(pending)} orphaned files: {e}")
+                pending.clear()
+
+            for blob in blobs_iter:
+                total_files += 1
+                # referenced_files holds object names, so this is a plain hash lookup
+                if blob.name not in referenced_files:
+                    if debug_enabled:
+                        logger.debug(f"  🗑️ Deleting orphaned file: {blob.name}")
+                    pending.append(blob)
+                    if len(pending) >= 100:  # GCS batch request limit
+                        flush_pending()
+            if pending:
+                flush_pending()
+
+            logger.info(f"Scanned {total_files} total files in GCP Storage")
+            logger.info(f"✅ GCP Storage cleanup completed: removed {orphaned_count} orphaned files")
+            return orphaned_count
+
         except Exception as e:
-            print(f"❌ Error cleaning up orphaned files: {e}")
+            logger.warning(f"⚠️ GCP Storage cleanup skipped (credentials issue): {e}")
             return 0
 
+    @staticmethod
+    def _is_empty(ref) -> bool:
+        """Check a (sub)collection for emptiness by fetching at most one doc"""
+        return next(iter(ref.limit(1).stream()), None) is None
+
+    def _room_is_empty(self, room_ref) -> bool:
+        """Check whether a room's canvas and messages subcollections hold no docs"""
+        return (self._is_empty(room_ref.collection('canvas'))
+                and self._is_empty(room_ref.collection('messages')))
+
+    async def _probe_empty_rooms(self, candidates: List[tuple]) -> List[bool]:
+        """Probe (room_id, ref) candidates for emptiness with pipelined async reads.
+
+        Within a room the canvas is probed first and messages only when the
+        canvas came back empty — the delete needs both, so a non-empty canvas
+        (the common case for rooms that saw any drawing) settles the answer
+        in one read. Rooms still overlap freely; the semaphore keeps total
+        in-flight requests bounded.
+        """
+        semaphore = asyncio.Semaphore(40)
+
+        async def _is_empty_async(ref) -> bool:
+            async for _ in ref.limit(1).stream():
+                return False
+            return True
+
+        async def probe(room_id: str) -> bool:
+            async with semaphore:
+                room_ref = self.async_db.collection('rooms').document(room_id)
+                return (await _is_empty_async(room_ref.collection('canvas'))
+                        and await _is_empty_async(room_ref.collection('messages')))
+
+        return await asyncio.gather(*(probe(room_id) for room_id, _ in candidates))
+
     def cleanup_orphaned_data(self) -> dict:
         """Comprehensive cleanup of all orphaned data (files, users, rooms)"""
         if not self.db:
             return {"error": "Firestore not available"}
         
         try:
-            print("🧹 Starting comprehensive orphaned data cleanup")
+            logger.info("🧹 Starting comprehensive orphaned data cleanup")
             results = {
                 "orphaned_files": 0,
                 "orphaned_users": 0,
@@ -715,84 +1069,110 @@ class FirestoreManager:
                 "stale_global_users": 0
             }
             
+            # One fused sweep: the four independent scans (file-bearing messages,
+            # room users, rooms, stale global users) run concurrently and each
+            # collection is read exactly once
+            stale_cutoff = datetime.now(timezone.utc) - timedelta(minutes=30)
+            if self.async_db:
+                message_docs, user_docs, room_docs, stale_docs = self._run_async(
+                    self._sweep_orphan_candidates(stale_cutoff)
+                )
+            else:
+                message_docs = list((self.db.collection_group('messages')
+                                     .where(filter=FieldFilter('file_url', '!=', None))
+                                     .select(['file_url'])).stream())
+                user_docs = list(self.db.collection_group('users').select(['__name__']).stream())
+                room_docs = list(self._rooms.select(['is_active', 'user_count']).stream())
+                stale_docs = list((self._global_users
+                                   .where(filter=FieldFilter('is_online', '==', False))
+                                   .where(filter=FieldFilter('last_seen', '<', stale_cutoff))
+                                   .select(['username'])).stream())
+
             # 1. Clean up orphaned files
-            results["orphaned_files"] = self.cleanup_orphaned_files()
-            
-            # 2. Clean up orphaned users in inactive rooms
-            rooms_ref = self.db.collection('rooms')
-            rooms = list(rooms_ref.stream())
-            
-            for room in rooms:
-                room_data = room.to_dict()
-                is_active = room_data.get('is_active', True)
-                
-                if not is_active:
-                    room_id = room.id
-                    users_ref = self.db.collection('rooms').document(room_id).collection('users')
-                    users = list(users_ref.stream())
-                    
-                    for user in users:
-                        user.reference.delete()
-                        results["orphaned_users"] += 1
-                    
-                    print(f"  🗑️ Cleaned {len(users)} orphaned users from inactive room: {room_id}")
-            
-            # 3. Clean up stale global users (offline for more than 30 minutes)
-            global_users_ref = self.db.collection('global_users')
-            global_users = list(global_users_ref.stream())
-            
-            from datetime import timedelta
-            cutoff_time = datetime.now() - timedelta(minutes=30)
-            
-            for user in global_users:
-                user_data = user.to_dict()
-                username = user_data.get('username')
-                is_online = user_data.get('is_online', False)
-                last_seen = user_data.get('last_seen')
-                
-                if not is_online and last_seen:
-                    # Handle both timezone-aware and timezone-naive datetimes
-                    if hasattr(last_seen, 'replace'):
-                        if hasattr(last_seen, 'tzinfo') and last_seen.tzinfo is not None:
-                            last_seen_naive = last_seen.replace(tzinfo=None)
-                        else:
-                            last_seen_naive = last_seen
-                        
-                        if last_seen_naive < cutoff_time:
-                            print(f"  🗑️ Removing stale global user: {username}")
-                            user.reference.delete()
-                            results["stale_global_users"] += 1
-            
-            # 4. Clean up completely empty inactive rooms
-            for room in rooms:
-                room_data = room.to_dict()
-                is_active = room_data.get('is_active', True)
-                user_count = room_data.get('user_count', 0)
-                
-                if not is_active and user_count == 0:
-                    room_id = room.id
-                    # Check if room has any data
-                    canvas_ref = self.db.collection('rooms').document(room_id).collection('canvas')
-                    messages_ref = self.db.collection('rooms').document(room_id).collection('messages')
-                    
-                    canvas_count = len(list(canvas_ref.stream()))
-                    messages_count = len(list(messages_ref.stream()))
-                    
-                    if canvas_count == 0 and messages_count == 0:
-                        print(f"  🗑️ Removing empty inactive room: {room_id}")
-                        room.reference.delete()
-                        results["orphaned_rooms"] += 1
+            referenced_files = set()
+            for doc in message_docs:
+                file_url = doc.to_dict().get('file_url')
+                if file_url:
+                    referenced_files.add(file_url.removeprefix(_FILES_URL_PREFIX))
+            results["orphaned_files"] = self._delete_unreferenced_blobs(referenced_files)
+
+            # Decode each room document exactly once; the fused pass below
+            # reads from this tuple list instead of re-running to_dict() per doc
+            room_meta = [(room.id, room.reference, d.get('is_active', True), d.get('user_count', 0))
+                         for room in room_docs for d in (room.to_dict(),)]
+
+            # Index sweep users by room so the fused pass is a dict lookup
+            users_by_room: Dict[str, List[Any]] = defaultdict(list)
+            for user in user_docs:
+                users_by_room[user.reference.parent.parent.id].append(user.reference)
+
+            # 2. One pass over rooms handles both inactive-room concerns:
+            # collect orphaned users and nominate empty-room delete candidates
+            debug_enabled = logger.isEnabledFor(logging.DEBUG)
+            orphan_user_refs = []
+            candidates = []
+            for room_id, room_ref, is_active, user_count in room_meta:
+                if is_active:
+                    continue
+                room_users = users_by_room.get(room_id)
+                if room_users:
+                    if debug_enabled:
+                        logger.debug(f"  🗑️ Cleaning {len(room_users)} orphaned users from inactive room: {room_id}")
+                    orphan_user_refs.extend(room_users)
+                if user_count == 0:
+                    candidates.append((room_id, room_ref))
+            results["orphaned_users"] = self._delete_refs_in_batches(orphan_user_refs)
+
+            # 3. Clean up stale global users (offline for more than 30 minutes).
+            # The sweep already filtered server-side, so every doc here is a
+            # confirmed deletion candidate.
+            stale_refs = []
+            for user in stale_docs:
+                if debug_enabled:
+                    logger.debug(f"  🗑️ Removing stale global user: {user.to_dict().get('username')}")
+                stale_refs.append(user.reference)
+            results["stale_global_users"] = self._delete_refs_in_batches(stale_refs)
+
+            # 4. Clean up completely empty inactive rooms (candidates were
+            # gathered in the fused pass above)
+
+            # Probe candidate rooms concurrently — the probes are independent
+            # Firestore reads, so pipelining overlaps their network latency
+            # instead of paying one RTT at a time. Prefer the async client;
+            # the thread pool is the fallback when it isn't available.
+            empty_room_refs = []
+            if candidates:
+                if self.async_db:
+                    empty_flags = self._run_async(self._probe_empty_rooms(candidates))
+                else:
+                    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as pool:
+                        empty_flags = list(pool.map(self._room_is_empty,
+                                                    (ref for _, ref in candidates)))
+                for (room_id, room_ref), is_empty in zip(candidates, empty_flags):
+                    if is_empty:
+                        logger.debug(f"  🗑️ Removing empty inactive room: {room_id}")
+                        empty_room_refs.append(room_ref)
+
+            # recursive_delete sweeps any subcollection docs that appeared
+            # after the emptiness probe, so a racing write can't orphan data
+            # under a deleted room; the shared BulkWriter self-throttles
+            if empty_room_refs:
+                bulk_writer = self.db.bulk_writer()
+                for room_ref in empty_room_refs:
+                    self.db.recursive_delete(room_ref, bulk_writer=bulk_writer)
+                bulk_writer.close()
+            results["orphaned_rooms"] = len(empty_room_refs)
             
-            print(f"✅ Comprehensive orphaned data cleanup completed:")
-            print(f"   - {results['orphaned_files']} orphaned files removed")
-            print(f"   - {results['orphaned_users']} orphaned users removed")
-            print(f"   - {results['orphaned_rooms']} empty rooms removed")
-            print(f"   - {results['stale_global_users']} stale global users removed")
+            logger.info(f"✅ Comprehensive orphaned data cleanup completed:")
+            logger.info(f"   - {results['orphaned_files']} orphaned files removed")
+            logger.info(f"   - {results['orphaned_users']} orphaned users removed")
+            logger.info(f"   - {results['orphaned_rooms']} empty rooms removed")
+            logger.info(f"   - {results['stale_global_users']} stale global users removed")
             
             return results
             
         except Exception as e:
-            print(f"❌ Error during comprehensive orphaned data cleanup: {e}")
+            logger.error(f"❌ Error during comprehensive orphaned data cleanup: {e}")
             return {"error": str(e)}
 
     def force_cleanup_stuck_users(self) -> int:
@@ -801,42 +1181,30 @@ class FirestoreManager:
             return 0
         
         try:
-            updated_count = 0
-            global_users_ref = self.db.collection('global_users')
-            global_users = list(global_users_ref.stream())
-            
-            from datetime import timedelta
-            cutoff_time = datetime.now() - timedelta(minutes=5)  # Mark as offline if not seen in 5 minutes
-            
-            for user in global_users:
+            cutoff_time = datetime.now(timezone.utc) - timedelta(minutes=5)  # Mark as offline if not seen in 5 minutes
+
+            # Filter server-side on the same (is_online, last_seen) composite
+            # index used by cleanup_global_users — only stuck users come back
+            stuck_query = (self._global_users
+                           .where(filter=FieldFilter('is_online', '==', True))
+                           .where(filter=FieldFilter('last_seen', '<', cutoff_time))
+                           .select(['username', 'last_seen']))
+
+            pending_updates = []
+            for user in stuck_query.stream():
                 user_data = user.to_dict()
-                username = user_data.get('username')
-                is_online = user_data.get('is_online', False)
-                last_seen = user_data.get('last_seen')
-                
-                # If user appears online but hasn't been seen recently, mark as offline
-                if is_online and last_seen:
-                    # Handle both timezone-aware and timezone-naive datetimes
-                    if hasattr(last_seen, 'replace'):
-                        # Convert to timezone-naive datetime for comparison
-                        if hasattr(last_seen, 'tzinfo') and last_seen.tzinfo is not None:
-                            # Timezone-aware datetime, convert to naive
-                            last_seen_naive = last_seen.replace(tzinfo=None)
-                        else:
-                            # Already timezone-naive
-                            last_seen_naive = last_seen
-                        
-                        if last_seen_naive < cutoff_time:
-                            print(f"Marking stuck user as offline: {username} (last seen: {last_seen})")
-                            user.reference.update({
-                                'is_online': False,
-                                'last_seen': last_seen
-                            })
-                            updated_count += 1
-            
-            print(f"Force cleanup completed: marked {updated_count} stuck users as offline")
+                logger.info(f"Marking stuck user as offline: {user_data.get('username')} "
+                            f"(last seen: {user_data.get('last_seen')})")
+                pending_updates.append((user.reference, {
+                    'is_online': False,
+                    'last_seen': user_data.get('last_seen')
+                }))
+
+            updated_count = self._update_refs_in_batches(pending_updates)
+
+            logger.info(f"Force cleanup completed: marked {updated_count} stuck users as offline")
             return updated_count
             
         except Exception as e:
-            print(f"Error during force cleanup: {e}")
+            logger.error(f"Error during force cleanup: {e}")
             return 0 
\ No newline at end of file
@@ -1,15 +1,21 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, File, UploadFile, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from pydantic import BaseModel
-import json
+import orjson
+import msgpack
+import hashlib
 import uuid
 import re
 from typing import List, Dict, Optional
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
+from google.cloud.firestore_v1.base_query import FieldFilter
 import asyncio
+import concurrent.futures
+import logging
 
 from .websocket import ConnectionManager
 from .storage import StorageManager
@@ -17,14 +23,33 @@ from .firestore_manager import FirestoreManager
 
 load_dotenv()
 
-app = FastAPI(title="Collaborative App API", version="1.0.0")
+# Route app logging (firestore_manager, websocket, storage) to stdout at
+# INFO. uvicorn only configures its own loggers; without a root handler
+# Python's last-resort handler drops everything below WARNING, which would
+# silence the init confirmations and cleanup progress logs.
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+
+logger = logging.getLogger(__name__)
+
+# ORJSONResponse serializes with orjson (~5x faster than stdlib json) for
+# every endpoint that returns a plain dict
+app = FastAPI(title="Collaborative App API", version="1.0.0",
+              default_response_class=ORJSONResponse)
+
+# Compress sizeable JSON bodies (room stats, message history, file listings);
+# small responses skip compression entirely via minimum_size
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
 
 # Add CORS middleware - centralized configuration
 allowed_origins_config = os.getenv("ALLOWED_ORIGINS", "*")
 if allowed_origins_config == "*":
     allowed_origins = ["*"]
 else:
-    allowed_origins = allowed_origins_config.split(",")
+    # Strip whitespace so "a.com, b.com" style values match exactly
+    allowed_origins = [o.strip() for o in allowed_origins_config.split(",") if o.strip()]
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,34 +57,111 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    # Only ETag needs exposing (conditional polling); a wildcard forces the
+    # middleware to echo header lists even for simple requests
+    expose_headers=["ETag"],
     max_age=86400,  # Cache preflight for 24 hours
 )
 
 
 
+# Environment-driven settings, parsed once at import. The frozenset makes the
+# upload-type check an O(1) hash lookup instead of re-splitting the env var
+# into a fresh list per request.
+ALLOWED_FILE_TYPES = frozenset(
+    os.getenv("ALLOWED_FILE_TYPES", "image/jpeg,image/png,image/gif,application/pdf").split(",")
+)
+CHAT_MESSAGE_LIMIT = int(os.getenv("CHAT_MESSAGE_LIMIT", "100"))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_SIZE_MB", "25")) * 1024 * 1024
+GCP_BUCKET_NAME = os.getenv("GCP_BUCKET_NAME", "collaborative-app-files-board-sync-466501")
+
 # Initialize managers
 firestore_manager = FirestoreManager()
 storage_manager = StorageManager()
 manager = ConnectionManager(firestore_manager=firestore_manager)
 
+# Formatted timestamp cache for high-rate WebSocket responses. Heartbeats and
+# room_info replies don't need sub-100ms timestamp precision, so a ticker
+# refreshes one shared string instead of every frame paying gettimeofday plus
+# an isoformat allocation.
+_now_iso_cached = datetime.now().isoformat()
+
+async def _refresh_now_iso():
+    global _now_iso_cached
+    while True:
+        _now_iso_cached = datetime.now().isoformat()
+        await asyncio.sleep(0.1)
+
+# Short-TTL response cache for the polled GET endpoints. Concurrent callers
+# for the same key await one shared in-flight task, so a burst of N polls
+# costs a single Firestore read instead of N.
+_response_cache: Dict[str, tuple] = {}  # key -> (expiry, task)
+_RESPONSE_CACHE_TTL = 1.0
+
+async def _cached_payload(key: str, producer):
+    loop = asyncio.get_running_loop()
+    entry = _response_cache.get(key)
+    if entry:
+        if entry[0] > loop.time():
+            return await asyncio.shield(entry[1])
+        # Expired — drop it immediately instead of leaving the payload
+        # pinned until this key happens to be requested again
+        _response_cache.pop(key, None)
+
+    task = loop.create_task(producer())
+    _response_cache[key] = (loop.time() + _RESPONSE_CACHE_TTL, task)
+    try:
+        return await asyncio.shield(task)
+    except Exception:
+        _response_cache.pop(key, None)
+        raise
+
+async def _sweep_response_cache():
+    """Evict expired response-cache entries.
+
+    Overwrite-on-request handles keys that keep being polled, but per-room
+    keys (room_users:/room_info:) for rooms nobody asks about again would
+    otherwise pin their last payload forever in a long-lived process.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(60)
+        now = loop.time()
+        for key in [k for k, (expiry, _) in _response_cache.items() if expiry <= now]:
+            _response_cache.pop(key, None)
+
+def _json_with_cache_headers(payload, request: Request) -> Response:
+    """Serialize once, tag with ETag, and short-circuit to 304 on a match"""
+    body = orjson.dumps(payload)
+    etag = '"' + hashlib.md5(body).hexdigest() + '"'
+    headers = {"Cache-Control": "public, max-age=1", "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def _run_blocking(func, *args):
+    """Run a blocking (Firestore/GCS) call in the shared worker pool.
+
+    Everything in firestore_manager does synchronous network I/O; calling it
+    directly from an async endpoint stalls the event loop — and every
+    WebSocket broadcast with it — for the full round-trip.
+    """
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
 # Background task for periodic cleanup
 @app.on_event("startup")
 async def startup_event():
     """Start background cleanup task"""
-    asyncio.create_task(periodic_cleanup())
-
-async def periodic_cleanup():
-    """Run cleanup every minute"""
-    cleanup_interval = int(os.getenv("CLEANUP_SCHEDULER_INTERVAL", "60"))
-    while True:
-        try:
-            await asyncio.sleep(cleanup_interval)
-            print("🕐 Running periodic cleanup check...")
-            manager.trigger_cleanup_if_needed()
-        except Exception as e:
-            print(f"Error in periodic cleanup: {e}")
-            await asyncio.sleep(cleanup_interval)
+    # Bounded pool for the blocking Firestore/GCS calls endpoints offload
+    asyncio.get_running_loop().set_default_executor(
+        concurrent.futures.ThreadPoolExecutor(max_workers=8)
+    )
+    # The manager's scheduler wakes for the next due room cleanup and also
+    # runs the stale-connection sweep; it replaces the old fixed-interval
+    # periodic_cleanup loop here
+    asyncio.create_task(manager._cleanup_scheduler())
+    asyncio.create_task(_refresh_now_iso())
+    asyncio.create_task(_sweep_response_cache())
 
 # Data models
 class UserCheckRequest(BaseModel):
@@ -74,6 +176,20 @@ class ChangeUsernameRequest(BaseModel):
     old_username: str
     new_username: str
 
+class CleanupRoomsRequest(BaseModel):
+    ids: List[str]
+
+async def _send_ws_reply(websocket: WebSocket, payload: dict, use_binary: bool):
+    """Reply in the encoding the client's last frame used.
+
+    Binary clients get MessagePack (compact frames, single C-call decode on
+    both ends); text clients keep receiving the JSON they already speak.
+    """
+    if use_binary:
+        await websocket.send_bytes(msgpack.packb(payload, use_bin_type=True))
+    else:
+        await websocket.send_text(orjson.dumps(payload).decode())
+
 @app.get("/")
 async def root():
     return {"message": "Collaborative App API is running!"}
@@ -82,6 +198,77 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+# WebSocket message handlers, one per frame type. All share a signature so
+# the receive loop dispatches with a single dict lookup instead of walking
+# an 11-way if/elif string-compare chain per frame.
+async def _handle_draw(room_id, websocket, message, use_binary):
+    # Broadcast drawing data to all users in the room
+    await manager.broadcast_draw(room_id, message["data"], websocket)
+
+async def _handle_stroke_start(room_id, websocket, message, use_binary):
+    await manager.broadcast_stroke_start(room_id, message["data"], websocket)
+
+async def _handle_stroke_point(room_id, websocket, message, use_binary):
+    stroke_id = message["data"]["strokeId"]
+    point = message["data"]["point"]
+    await manager.broadcast_stroke_point(room_id, stroke_id, point, websocket)
+
+async def _handle_stroke_end(room_id, websocket, message, use_binary):
+    stroke_id = message["data"]["strokeId"]
+    await manager.broadcast_stroke_end(room_id, stroke_id, websocket)
+
+async def _handle_chat(room_id, websocket, message, use_binary):
+    # Lazy %s formatting: no string is built unless debug logging is on
+    logger.debug("Received chat message in room %s", room_id)
+    await manager.broadcast_chat(room_id, message["data"], websocket)
+
+async def _handle_join(room_id, websocket, message, use_binary):
+    await manager.broadcast_user_joined(room_id, message["data"], websocket)
+
+async def _handle_leave(room_id, websocket, message, use_binary):
+    # Handle user leaving - disconnect them from the room
+    logger.debug("Received leave message in room %s", room_id)
+    await manager.disconnect(websocket, room_id)
+
+async def _handle_name_change(room_id, websocket, message, use_binary):
+    await manager.update_user_name(websocket, message["data"]["new_name"])
+
+async def _handle_get_room_info(room_id, websocket, message, use_binary):
+    # Send room information back to the requesting user
+    room_info = await _run_blocking(manager.get_room_info, room_id)
+    await _send_ws_reply(websocket, {
+        "type": "room_info",
+        "data": room_info,
+        "timestamp": _now_iso_cached
+    }, use_binary)
+
+async def _handle_clear_canvas(room_id, websocket, message, use_binary):
+    await manager.broadcast_clear_canvas(room_id, websocket)
+
+async def _handle_heartbeat(room_id, websocket, message, use_binary):
+    # Track active connections; only respond to sockets we still manage
+    if websocket in manager.connection_heartbeats:
+        manager.connection_heartbeats[websocket] = datetime.now()
+        logger.debug("💓 Heartbeat received from connection in room %s", room_id)
+        await _send_ws_reply(websocket, {
+            "type": "heartbeat_response",
+            "timestamp": _now_iso_cached
+        }, use_binary)
+
+WS_HANDLERS = {
+    "draw": _handle_draw,
+    "stroke_start": _handle_stroke_start,
+    "stroke_point": _handle_stroke_point,
+    "stroke_end": _handle_stroke_end,
+    "chat": _handle_chat,
+    "join": _handle_join,
+    "leave": _handle_leave,
+    "name_change": _handle_name_change,
+    "get_room_info": _handle_get_room_info,
+    "clear_canvas": _handle_clear_canvas,
+    "heartbeat": _handle_heartbeat,
+}
+
 @app.websocket("/ws/{room_id}")
 async def websocket_endpoint(websocket: WebSocket, room_id: str):
     # Get user_name from query parameters
@@ -93,75 +280,48 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str):
     except Exception as e:
         # Connection was rejected (e.g., username taken, room doesn't exist)
         error_msg = str(e)
-        print(f"❌ Connection rejected: {error_msg}")
-        
+        logger.warning("❌ Connection rejected: %s", error_msg)
+
         # Log the specific reason for debugging
         if "Username" in error_msg:
-            print(f"🔍 Username '{user_name}' was rejected")
+            logger.warning("🔍 Username '%s' was rejected", user_name)
         elif "Room" in error_msg:
-            print(f"🔍 Room '{room_id}' was rejected")
+            logger.warning("🔍 Room '%s' was rejected", room_id)
         
         return  # Exit early, don't try to receive messages
     
-    # Only proceed with message handling if connection was successful
+    # Only proceed with message handling if connection was successful.
+    # Cleanup lives in finally so the connection is released on any exit —
+    # clean disconnect, malformed frame, or handler error alike.
     try:
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                break
+
+            # Binary frames carry MessagePack (~4x smaller stroke points);
+            # text frames stay JSON so existing clients keep working. Either
+            # way the payload decodes in a single C call.
+            raw = frame.get("bytes")
+            if raw is not None:
+                message = msgpack.unpackb(raw, raw=False)
+                use_binary = True
+                # Remember the preference so room broadcasts reach this
+                # client as MessagePack too
+                manager.binary_connections.add(websocket)
+            else:
+                message = orjson.loads(frame["text"])
+                use_binary = False
+                manager.binary_connections.discard(websocket)
             
-            # Handle different message types
-            if message["type"] == "draw":
-                # Broadcast drawing data to all users in the room
-                await manager.broadcast_draw(room_id, message["data"], websocket)
-            elif message["type"] == "stroke_start":
-                # Handle stroke start
-                await manager.broadcast_stroke_start(room_id, message["data"], websocket)
-            elif message["type"] == "stroke_point":
-                # Handle stroke point
-                stroke_id = message["data"]["strokeId"]
-                point = message["data"]["point"]
-                await manager.broadcast_stroke_point(room_id, stroke_id, point, websocket)
-            elif message["type"] == "stroke_end":
-                # Handle stroke end
-                stroke_id = message["data"]["strokeId"]
-                await manager.broadcast_stroke_end(room_id, stroke_id, websocket)
-            elif message["type"] == "chat":
-                # Broadcast chat message to all users in the room
-                print(f"Received chat message from user in room {room_id}: {message['data']}")
-                await manager.broadcast_chat(room_id, message["data"], websocket)
-            elif message["type"] == "join":
-                # Handle user joining
-                await manager.broadcast_user_joined(room_id, message["data"], websocket)
-            elif message["type"] == "leave":
-                # Handle user leaving - disconnect them from the room
-                print(f"Received leave message from user in room {room_id}")
-                await manager.disconnect(websocket, room_id)
-            elif message["type"] == "name_change":
-                # Handle user name change
-                await manager.update_user_name(websocket, message["data"]["new_name"])
-            elif message["type"] == "get_room_info":
-                # Send room information back to the requesting user
-                room_info = manager.get_room_info(room_id)
-                await websocket.send_text(json.dumps({
-                    "type": "room_info",
-                    "data": room_info,
-                    "timestamp": datetime.now().isoformat()
-                }))
-            elif message["type"] == "clear_canvas":
-                # Handle canvas clear request
-                await manager.broadcast_clear_canvas(room_id, websocket)
-            elif message["type"] == "heartbeat":
-                # NEW: Handle heartbeat messages to track active connections
-                if websocket in manager.connection_heartbeats:
-                    manager.connection_heartbeats[websocket] = datetime.now()
-                    print(f"💓 Heartbeat received from connection in room {room_id}")
-                    # Send heartbeat response
-                    await websocket.send_text(json.dumps({
-                        "type": "heartbeat_response",
-                        "timestamp": datetime.now().isoformat()
-                    }))
-                
+            # Dispatch on message type with a single dict lookup
+            handler = WS_HANDLERS.get(message["type"])
+            if handler:
+                await handler(room_id, websocket, message, use_binary)
+
     except WebSocketDisconnect:
+        pass
+    finally:
         await manager.disconnect(websocket, room_id)
 
 @app.post("/upload")
@@ -170,11 +330,14 @@ async def upload_file(file: UploadFile = File(...)):
         print(f"📁 File upload request: {file.filename}, type: {file.content_type}, size: {file.size}")
         
         # Validate file type
-        allowed_types_str = os.getenv("ALLOWED_FILE_TYPES", "image/jpeg,image/png,image/gif,application/pdf")
-        allowed_types = allowed_types_str.split(",")
-        if file.content_type not in allowed_types:
+        if file.content_type not in ALLOWED_FILE_TYPES:
             print(f"❌ File type not allowed: {file.content_type}")
             raise HTTPException(status_code=400, detail="File type not allowed")
+
+        # Reject oversize uploads before touching the body
+        if file.size and file.size > MAX_UPLOAD_BYTES:
+            print(f"❌ File too large: {file.size} bytes")
+            raise HTTPException(status_code=413, detail="File too large")
         
         print("✅ File type validated, uploading to GCP Storage...")
         
@@ -198,16 +361,24 @@ async def upload_file(file: UploadFile = File(...)):
 
 
 @app.get("/rooms/{room_id}/users")
-async def get_room_users(room_id: str):
-    users = manager.get_room_users(room_id)
-    return {"users": users}
+async def get_room_users(room_id: str, request: Request):
+    async def _produce():
+        return {"users": manager.get_room_users(room_id)}
+
+    payload = await _cached_payload(f"room_users:{room_id}", _produce)
+    return _json_with_cache_headers(payload, request)
 
 @app.get("/rooms/{room_id}/info")
-async def get_room_info(room_id: str):
-    # Clean up connections before getting room info
-    manager.cleanup_connections()
-    room_info = manager.get_room_info(room_id)
-    return room_info
+async def get_room_info(room_id: str, request: Request):
+    async def _produce():
+        # Clean up connections before getting room info
+        manager.cleanup_connections()
+        # get_room_info hits Firestore on a room-info cache miss — keep
+        # that off the event loop like the sibling endpoints
+        return await _run_blocking(manager.get_room_info, room_id)
+
+    payload = await _cached_payload(f"room_info:{room_id}", _produce)
+    return _json_with_cache_headers(payload, request)
 
 @app.get("/users")
 async def get_all_users():
@@ -222,9 +393,9 @@ async def get_global_users():
     """Get all global users for debugging"""
     try:
         # Get all global users from Firestore
-        global_users_ref = firestore_manager.db.collection('global_users')
-        global_users = list(global_users_ref.stream())
-        
+        global_users_ref = firestore_manager.global_users
+        global_users = await _run_blocking(lambda: list(global_users_ref.stream()))
+
         users = []
         for user in global_users:
             user_data = user.to_dict()
@@ -245,24 +416,65 @@ async def get_global_users():
 async def check_username(request: UserCheckRequest):
     """Check if a username is available globally"""
     # Use global username checking instead of local checking
-    is_available = firestore_manager.is_username_available_globally(
-        request.username, 
+    is_available = await _run_blocking(
+        firestore_manager.is_username_available_globally,
+        request.username,
         request.current_username
     )
     return {"available": is_available}
 
 @app.get("/rooms")
-async def get_all_rooms():
+async def get_all_rooms(request: Request):
     """Get all active rooms"""
-    # Clean up connections before getting rooms
-    manager.cleanup_connections()
-    rooms = firestore_manager.get_all_rooms()
-    return {"rooms": rooms}
+    async def _produce():
+        # Clean up connections before getting rooms
+        manager.cleanup_connections()
+        rooms = await _run_blocking(firestore_manager.get_all_rooms)
+        return {"rooms": rooms}
+
+    payload = await _cached_payload("all_rooms", _produce)
+    return _json_with_cache_headers(payload, request)
+
+@app.get("/rooms/count")
+async def get_room_count():
+    """Count active rooms without materializing any room documents"""
+    try:
+        def _count():
+            rooms_ref = firestore_manager.rooms.where(
+                filter=FieldFilter('is_active', '==', True))
+            # Server-side COUNT aggregation — only the number crosses the
+            # wire. Fall back to counting '__name__'-projected refs on
+            # backends without aggregation support (e.g. an old emulator).
+            try:
+                return int(rooms_ref.count().get()[0][0].value)
+            except Exception:
+                return sum(1 for _ in rooms_ref.select(['__name__']).stream())
+
+        return {"count": await _run_blocking(_count)}
+    except Exception as e:
+        print(f"Error counting rooms: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/users/global/count")
+async def get_global_user_count():
+    """Count global users without materializing any user documents"""
+    try:
+        def _count():
+            users_ref = firestore_manager.global_users
+            try:
+                return int(users_ref.count().get()[0][0].value)
+            except Exception:
+                return sum(1 for _ in users_ref.select(['__name__']).stream())
+
+        return {"count": await _run_blocking(_count)}
+    except Exception as e:
+        print(f"Error counting global users: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/rooms")
 async def create_room(request: CreateRoomRequest):
     """Create a new room"""
-    room_id = firestore_manager.create_room(request.name, request.created_by)
+    room_id = await _run_blocking(firestore_manager.create_room, request.name, request.created_by)
     if room_id:
         return {"room_id": room_id, "name": request.name, "created_by": request.created_by}
     else:
@@ -272,12 +484,12 @@ async def create_room(request: CreateRoomRequest):
 async def change_username(request: ChangeUsernameRequest):
     """Change a user's username globally"""
     # Check if new username is available globally
-    is_available = firestore_manager.is_username_available_globally(request.new_username)
+    is_available = await _run_blocking(firestore_manager.is_username_available_globally, request.new_username)
     if not is_available:
         raise HTTPException(status_code=400, detail="Username is already taken")
-    
+
     # Unregister old username globally
-    firestore_manager.unregister_global_user(request.old_username)
+    await _run_blocking(firestore_manager.unregister_global_user, request.old_username)
     
     # Register new username globally (we'll need the user_id and room_id)
     # For now, we'll let the WebSocket connection handle the registration
@@ -293,7 +505,7 @@ async def cleanup_connections():
     try:
         manager.cleanup_connections()
         # Trigger cleanup check
-        manager.trigger_cleanup_if_needed()
+        await _run_blocking(manager.trigger_cleanup_if_needed)
         return {
             "success": True, 
             "message": "Cleanup completed and cleanup check triggered",
@@ -308,10 +520,10 @@ async def cleanup_auto_users():
     """Clean up auto-generated users that are stuck"""
     try:
         # Trigger auto-user cleanup
-        manager._cleanup_stuck_auto_users()
-        
+        await _run_blocking(manager._cleanup_stuck_auto_users)
+
         # Also run the Firestore cleanup
-        auto_removed = firestore_manager.cleanup_auto_generated_users()
+        auto_removed = await _run_blocking(firestore_manager.cleanup_auto_generated_users)
         
         return {
             "success": True,
@@ -326,18 +538,20 @@ async def cleanup_room_users(room_id: str):
     """Clean up users in a specific room"""
     try:
         # Remove auto-generated users from this room
-        auto_removed = 0
-        users = firestore_manager.get_room_users(room_id)
-        
-        for user in users:
-            user_name = user.get('name', '')
-            user_id = user.get('id')
-            
-            if user_name.startswith('User '):
-                print(f"Removing auto-generated user: {user_name}")
-                firestore_manager.remove_user_from_room(room_id, user_id)
-                auto_removed += 1
-        
+        def _remove_auto_users():
+            removed = 0
+            for user in firestore_manager.get_room_users(room_id):
+                user_name = user.get('name', '')
+                user_id = user.get('id')
+
+                if user_name.startswith('User '):
+                    print(f"Removing auto-generated user: {user_name}")
+                    firestore_manager.remove_user_from_room(room_id, user_id)
+                    removed += 1
+            return removed
+
+        auto_removed = await _run_blocking(_remove_auto_users)
+
         return {
             "success": True, 
             "message": f"Removed {auto_removed} auto-generated users from room {room_id}"
@@ -350,7 +564,7 @@ async def cleanup_room_users(room_id: str):
 async def cleanup_room_data_endpoint(room_id: str):
     """Clean up all data for a specific room (canvas, messages, users)"""
     try:
-        success = firestore_manager.cleanup_room_data(room_id)
+        success = await _run_blocking(firestore_manager.cleanup_room_data, room_id)
         if success:
             return {
                 "success": True,
@@ -362,11 +576,38 @@ async def cleanup_room_data_endpoint(room_id: str):
         print(f"Error cleaning up room data: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/cleanup/rooms")
+async def cleanup_rooms_bulk(request: CleanupRoomsRequest):
+    """Clean up many rooms in one request.
+
+    The nuclear scripts used to POST /cleanup/room-data once per room;
+    this takes the whole id list and fans the per-room cleanups across
+    the worker pool, so the client pays one round-trip regardless of
+    room count. Each room's subcollection deletes are already batched
+    (500 ops per commit) inside cleanup_room_data.
+    """
+    try:
+        results = await asyncio.gather(
+            *(_run_blocking(firestore_manager.cleanup_room_data, room_id)
+              for room_id in request.ids)
+        )
+        cleaned = sum(1 for ok in results if ok)
+        failed = [room_id for room_id, ok in zip(request.ids, results) if not ok]
+        return {
+            "success": not failed,
+            "message": f"Cleaned up {cleaned} of {len(request.ids)} rooms",
+            "rooms_cleaned": cleaned,
+            "failed_rooms": failed
+        }
+    except Exception as e:
+        print(f"Error cleaning up rooms in bulk: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/cleanup/orphaned-files")
 async def cleanup_orphaned_files_endpoint():
     """Clean up orphaned files in GCP Storage"""
     try:
-        orphaned_count = firestore_manager.cleanup_orphaned_files()
+        orphaned_count = await _run_blocking(firestore_manager.cleanup_orphaned_files)
         return {
             "success": True,
             "message": f"Cleaned up {orphaned_count} orphaned files"
@@ -380,26 +621,31 @@ async def comprehensive_cleanup():
     """Run comprehensive cleanup of all stale data"""
     try:
         print("🧹 Starting comprehensive cleanup...")
-        
-        # Clean up auto-generated users
-        auto_removed = firestore_manager.cleanup_auto_generated_users()
-        
-        # Clean up duplicate users
-        rooms = firestore_manager.get_all_rooms()
-        duplicate_removed = 0
-        for room in rooms:
-            room_id = room.get('id')
-            if room_id:
-                duplicate_removed += firestore_manager.remove_duplicate_users(room_id)
-        
-        # Clean up stale global users
-        global_removed = firestore_manager.cleanup_global_users()
-        
-        # Clean up orphaned files
-        orphaned_files = firestore_manager.cleanup_orphaned_files()
-        
-        # Trigger room cleanup check
-        manager.trigger_cleanup_if_needed()
+
+        def _comprehensive():
+            # Clean up auto-generated users
+            auto_removed = firestore_manager.cleanup_auto_generated_users()
+
+            # Clean up duplicate users
+            rooms = firestore_manager.get_all_rooms()
+            duplicate_removed = 0
+            for room in rooms:
+                room_id = room.get('id')
+                if room_id:
+                    duplicate_removed += firestore_manager.remove_duplicate_users(room_id)
+
+            # Clean up stale global users
+            global_removed = firestore_manager.cleanup_global_users()
+
+            # Clean up orphaned files
+            orphaned_files = firestore_manager.cleanup_orphaned_files()
+
+            # Trigger room cleanup check
+            manager.trigger_cleanup_if_needed()
+            return auto_removed, duplicate_removed, global_removed, orphaned_files
+
+        auto_removed, duplicate_removed, global_removed, orphaned_files = \
+            await _run_blocking(_comprehensive)
         
         return {
             "success": True,
@@ -414,7 +660,7 @@ async def comprehensive_cleanup():
 async def trigger_cleanup():
     """Manually trigger cleanup check"""
     try:
-        manager.trigger_cleanup_if_needed()
+        await _run_blocking(manager.trigger_cleanup_if_needed)
         return {
             "success": True,
             "message": "Cleanup check triggered",
@@ -453,10 +699,9 @@ async def get_cleanup_status():
 async def get_room_stats():
     """Get detailed statistics about rooms"""
     try:
-        rooms = firestore_manager.get_all_rooms()
-        room_stats = []
-        
-        for room in rooms:
+        rooms = await _run_blocking(firestore_manager.get_all_rooms)
+
+        def _stats_for_room(room):
             room_id = room.get('id')
             room_name = room.get('name', 'Unknown')
             user_count = room.get('user_count', 0)
@@ -464,20 +709,30 @@ async def get_room_stats():
             last_activity = room.get('last_activity')
             is_active = room.get('is_active', True)
             
-            # Get message count
-            messages_ref = firestore_manager.db.collection('rooms').document(room_id).collection('messages')
-            message_count = len(list(messages_ref.stream()))
-            
-            # Get canvas stroke count
-            canvas_ref = firestore_manager.db.collection('rooms').document(room_id).collection('canvas')
-            canvas_docs = list(canvas_ref.stream())
+            # Server-side COUNT aggregation — no message documents cross the
+            # wire. If the backend doesn't support aggregation (e.g. an old
+            # emulator), count '__name__'-projected refs instead of
+            # materializing full documents in a list.
+            room_ref = firestore_manager.rooms.document(room_id)
+            messages_ref = room_ref.collection('messages')
+            try:
+                message_count = int(messages_ref.count().get()[0][0].value)
+            except Exception:
+                message_count = sum(1 for _ in messages_ref.select(['__name__']).stream())
+
+            # Read the denormalized stroke_count field written by
+            # save_canvas_state; fall back to the full doc for canvases
+            # saved before the counter existed
+            canvas_ref = room_ref.collection('canvas')
             stroke_count = 0
-            for canvas_doc in canvas_docs:
-                canvas_data = canvas_doc.to_dict()
-                drawings = canvas_data.get('drawings', [])
-                stroke_count += len(drawings)
-            
-            room_stats.append({
+            for canvas_doc in canvas_ref.select(['stroke_count']).stream():
+                count = canvas_doc.to_dict().get('stroke_count')
+                if count is None:
+                    full_doc = canvas_doc.reference.get().to_dict() or {}
+                    count = len(full_doc.get('drawings', []))
+                stroke_count += count
+
+            return {
                 "room_id": room_id,
                 "name": room_name,
                 "user_count": user_count,
@@ -486,8 +741,13 @@ async def get_room_stats():
                 "is_active": is_active,
                 "created_at": created_at.isoformat() if hasattr(created_at, 'isoformat') else str(created_at),
                 "last_activity": last_activity.isoformat() if hasattr(last_activity, 'isoformat') else str(last_activity)
-            })
-        
+            }
+
+        # Fan the per-room reads across the worker pool and collect in order
+        room_stats = list(await asyncio.gather(
+            *(_run_blocking(_stats_for_room, room) for room in rooms)
+        ))
+
         return {
             "rooms": room_stats,
             "total_rooms": len(rooms),
@@ -502,10 +762,10 @@ async def force_cleanup_stuck_users():
     """Force cleanup of users that appear online but haven't been seen recently"""
     try:
         # Force cleanup of stuck users
-        updated_count = firestore_manager.force_cleanup_stuck_users()
-        
+        updated_count = await _run_blocking(firestore_manager.force_cleanup_stuck_users)
+
         # Also run the regular global user cleanup
-        removed_count = firestore_manager.cleanup_global_users()
+        removed_count = await _run_blocking(firestore_manager.cleanup_global_users)
         
         return {
             "success": True,
@@ -521,7 +781,7 @@ async def force_cleanup_stuck_users():
 async def cleanup_orphaned_data():
     """Comprehensive cleanup of all orphaned data (files, users, rooms)"""
     try:
-        results = firestore_manager.cleanup_orphaned_data()
+        results = await _run_blocking(firestore_manager.cleanup_orphaned_data)
         
         if "error" in results:
             raise HTTPException(status_code=500, detail=results["error"])
@@ -537,11 +797,11 @@ async def cleanup_orphaned_data():
 
 @app.get("/rooms/{room_id}/messages")
 async def get_room_messages(room_id: str, limit: int = None):
-    if limit is None:
-        limit = int(os.getenv("CHAT_MESSAGE_LIMIT", "100"))
     """Get chat messages for a room"""
+    if limit is None:
+        limit = CHAT_MESSAGE_LIMIT
     try:
-        messages = firestore_manager.get_room_messages(room_id, limit)
+        messages = await _run_blocking(firestore_manager.get_room_messages, room_id, limit)
         return {"messages": messages}
     except Exception as e:
         print(f"Error getting room messages: {e}")
@@ -551,55 +811,57 @@ async def get_room_messages(room_id: str, limit: int = None):
 async def delete_all_files():
     """Delete ALL files from GCP Storage bucket (nuclear option)"""
     try:
-        # Get all files from the bucket
-        bucket_name = os.getenv("GCP_BUCKET_NAME", "collaborative-app-files-board-sync-466501")
-        
-        # Initialize GCP Storage client with proper authentication
-        from google.cloud import storage
-        from google.oauth2 import service_account
-        
-        # Use the same service account credentials as the storage manager
-        credentials_path = "board-sync-466501-c38a2cead941.json"
-        if os.path.exists(credentials_path):
-            credentials = service_account.Credentials.from_service_account_file(credentials_path)
-            client = storage.Client(credentials=credentials)
-        else:
-            # Fallback to default credentials
-            client = storage.Client()
-        
-        bucket = client.bucket(bucket_name)
-        
-        # List all blobs (files) in the bucket
-        blobs = list(bucket.list_blobs())
-        
-        print(f"🗂️  Found {len(blobs)} files in bucket {bucket_name}")
-        
-        # List all files that will be deleted
-        file_list = []
-        for blob in blobs:
-            file_info = {
-                "name": blob.name,
-                "size": blob.size,
-                "created": blob.time_created.isoformat() if blob.time_created else "Unknown",
-                "updated": blob.updated.isoformat() if blob.updated else "Unknown"
-            }
-            file_list.append(file_info)
-            print(f"   📄 {blob.name} ({blob.size} bytes)")
-        
-        files_removed = 0
-        
-        # Delete all files
-        print(f"\n🗑️  Deleting {len(blobs)} files...")
-        for blob in blobs:
-            try:
-                blob.delete()
-                files_removed += 1
-                print(f"   ✅ Deleted: {blob.name}")
-            except Exception as e:
-                print(f"   ❌ Failed to delete {blob.name}: {e}")
-        
-        print(f"✅ Deleted {files_removed} files from GCP bucket")
-        
+        def _delete_all_blobs():
+            # Get all files from the bucket
+            bucket_name = GCP_BUCKET_NAME
+
+            # Reuse the storage manager's client — it already loaded the same
+            # service-account credentials at startup, so no per-request file
+            # read, key parse, or fresh connection pool
+            client = storage_manager.client
+            if client is None:
+                from google.cloud import storage
+                client = storage.Client()
+
+            bucket = client.bucket(bucket_name)
+
+            # Stream the listing and delete through client.batch() in
+            # groups of 100 (the GCS batch limit) — each group is one
+            # multipart HTTP request instead of one DELETE per blob, the
+            # same idiom as StorageManager.delete_files
+            file_list = []
+            files_removed = 0
+            pending = []
+
+            def _flush_pending():
+                nonlocal files_removed
+                try:
+                    with client.batch():
+                        for blob in pending:
+                            blob.delete()
+                    files_removed += len(pending)
+                except Exception as e:
+                    print(f"   ❌ Failed to delete a batch of {len(pending)} files: {e}")
+                pending.clear()
+
+            for blob in bucket.list_blobs(page_size=1000):
+                file_list.append({
+                    "name": blob.name,
+                    "size": blob.size,
+                    "created": blob.time_created.isoformat() if blob.time_created else "Unknown",
+                    "updated": blob.updated.isoformat() if blob.updated else "Unknown"
+                })
+                pending.append(blob)
+                if len(pending) >= 100:
+                    _flush_pending()
+            if pending:
+                _flush_pending()
+
+            print(f"✅ Deleted {files_removed} of {len(file_list)} files from GCP bucket {bucket_name}")
+            return files_removed, file_list
+
+        files_removed, file_list = await _run_blocking(_delete_all_blobs)
+
         return {
             "success": True,
             "message": f"Deleted {files_removed} files from GCP bucket",
@@ -616,26 +878,26 @@ async def delete_all_files():
 async def delete_all_global_users():
     """Delete ALL global users from Firestore (nuclear option)"""
     try:
-        # Get all global users
-        global_users_ref = firestore_manager.db.collection('global_users')
-        global_users = list(global_users_ref.stream())
-        
-        users_removed = 0
-        print(f"👥 Found {len(global_users)} global users to delete")
-        
-        # Delete all global users
-        for user in global_users:
-            try:
-                user.reference.delete()
-                users_removed += 1
-                user_data = user.to_dict()
-                username = user_data.get('username', 'Unknown')
-                print(f"   🗑️  Deleted global user: {username}")
-            except Exception as e:
-                print(f"   ❌ Failed to delete global user: {e}")
-        
-        print(f"✅ Deleted {users_removed} global users")
-        
+        def _delete_all_globals():
+            # Only the document references are needed for deletion
+            global_users_ref = firestore_manager.global_users
+            global_users = list(global_users_ref.select(['__name__']).stream())
+
+            print(f"👥 Found {len(global_users)} global users to delete")
+
+            # BulkWriter batches and throttles the deletes instead of issuing
+            # one blocking RPC per document
+            bulk_writer = firestore_manager.db.bulk_writer()
+            for user in global_users:
+                bulk_writer.delete(user.reference)
+            bulk_writer.close()
+            users_removed = len(global_users)
+
+            print(f"✅ Deleted {users_removed} global users")
+            return users_removed
+
+        users_removed = await _run_blocking(_delete_all_globals)
+
         return {
             "success": True,
             "message": f"Deleted {users_removed} global users",
@@ -649,34 +911,38 @@ async def delete_all_global_users():
 async def cleanup_server_restart():
     """Clean up global users that appear online but have no active connections (server restart scenario)"""
     try:
-        # Get all global users marked as online
-        global_users_ref = firestore_manager.db.collection('global_users')
-        online_users = list(global_users_ref.where('is_online', '==', True).stream())
-        
-        users_cleaned = 0
-        for user in online_users:
-            user_data = user.to_dict()
-            username = user_data.get('username')
-            user_id = user_data.get('user_id')
-            
-            # Check if this user has any active connections
-            has_active_connection = False
-            for room_connections in manager.active_connections.values():
-                for ws in room_connections:
-                    if ws in manager.connection_users:
-                        connection_user = manager.connection_users[ws]
-                        if connection_user.get('id') == user_id:
-                            has_active_connection = True
-                            break
-                if has_active_connection:
-                    break
-            
-            # If no active connection found, mark user as offline
-            if not has_active_connection:
-                print(f"🧹 Marking user {username} as offline (no active connection)")
-                firestore_manager.update_global_user_status(username, is_online=False)
-                users_cleaned += 1
-        
+        def _mark_disconnected_offline():
+            # Get all global users marked as online
+            global_users_ref = firestore_manager.global_users
+            online_users = list(global_users_ref.where('is_online', '==', True).stream())
+
+            # Build the set of connected user ids once instead of scanning
+            # every connection per user
+            active_user_ids = {
+                user.get('id') for user in manager.connection_users.values()
+            }
+
+            users_cleaned = 0
+            now = datetime.now(timezone.utc)
+            bulk_writer = firestore_manager.db.bulk_writer()
+            for user in online_users:
+                user_data = user.to_dict()
+                username = user_data.get('username')
+                user_id = user_data.get('user_id')
+
+                # If no active connection found, mark user as offline
+                if user_id not in active_user_ids:
+                    print(f"🧹 Marking user {username} as offline (no active connection)")
+                    bulk_writer.update(user.reference, {
+                        'is_online': False,
+                        'last_seen': now
+                    })
+                    users_cleaned += 1
+            bulk_writer.close()
+            return users_cleaned
+
+        users_cleaned = await _run_blocking(_mark_disconnected_offline)
+
         return {
             "success": True,
             "message": f"Server restart cleanup completed. Marked {users_cleaned} users as offline.",
@@ -686,8 +952,55 @@ async def cleanup_server_restart():
         print(f"Error during server restart cleanup: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/cleanup/run-all")
+async def run_all_cleanups():
+    """Run every cleanup pass in one request.
+
+    Replaces the five separate POSTs the nuclear scripts used to issue —
+    one round-trip instead of five, and the shared work (room listing,
+    global-user scans) stays inside the process. Each pass runs even if
+    an earlier one fails; failures are reported per step.
+    """
+    steps = [
+        ("orphaned-files", cleanup_orphaned_files_endpoint),
+        ("orphaned-data", cleanup_orphaned_data),
+        ("force-stuck-users", force_cleanup_stuck_users),
+        ("server-restart", cleanup_server_restart),
+        ("comprehensive", comprehensive_cleanup),
+    ]
+
+    results = {}
+    failures = 0
+    for name, handler in steps:
+        try:
+            results[name] = await handler()
+        except HTTPException as e:
+            results[name] = {"success": False, "error": e.detail}
+            failures += 1
+        except Exception as e:
+            results[name] = {"success": False, "error": str(e)}
+            failures += 1
+
+    return {
+        "success": failures == 0,
+        "message": f"Ran {len(steps)} cleanup passes ({failures} failed)",
+        "results": results
+    }
+
 if __name__ == "__main__":
     import uvicorn
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "8000"))
-    uvicorn.run(app, host=host, port=port) 
\ No newline at end of file
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    # "auto" selects uvloop and httptools when the compiled wheels are
+    # installed (they are pinned in requirements.txt) and falls back to the
+    # stdlib implementations on platforms without them
+    uvicorn.run(
+        "app.main:app",
+        host=host,
+        port=port,
+        loop="auto",
+        http="auto",
+        ws="websockets",
+        workers=workers,
+    ) 
\ No newline at end of file
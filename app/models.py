@@ -1,8 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
 class DrawData(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     x: float
     y: float
     color: str
@@ -10,6 +12,8 @@ class DrawData(BaseModel):
     is_drawing: bool
 
 class ChatMessage(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     user_id: str
     message: str
     timestamp: datetime
@@ -18,18 +22,24 @@ class ChatMessage(BaseModel):
     file_type: Optional[str] = None
 
 class UserInfo(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     id: str
     room_id: str
     joined_at: datetime
     is_online: bool = True
 
 class RoomInfo(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     id: str
     users: List[str]
     created_at: datetime
     last_activity: datetime
 
 class FileUploadResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     success: bool
     file_url: str
     filename: str
@@ -38,4 +48,4 @@ class FileUploadResponse(BaseModel):
 class WebSocketMessage(BaseModel):
     type: str  # "draw", "chat", "join", "leave"
     data: Dict[str, Any]
-    timestamp: Optional[datetime] = None 
\ No newline at end of file
+    timestamp: Optional[datetime] = None
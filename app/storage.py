@@ -1,98 +1,283 @@
 from google.cloud import storage
+from google.cloud.exceptions import NotFound
+from google.oauth2 import service_account
 from fastapi import UploadFile
+import asyncio
+import functools
+import itertools
+import logging
+import mimetypes
 import os
-import uuid
-from datetime import datetime, timedelta
-from typing import Optional
+import requests.adapters
+import secrets
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Uploads at or above this size go through a concurrent multipart upload
+# instead of a single-stream PUT
+MPU_THRESHOLD_BYTES = int(os.getenv("GCS_MPU_THRESHOLD_MB", "32")) * 1024 * 1024
+
+# Resumable-upload chunk size; larger chunks mean fewer HTTP round trips per
+# upload. The resumable protocol requires a multiple of 256 KB.
+UPLOAD_CHUNK_SIZE = max(
+    int(os.getenv("GCS_CHUNK_SIZE", str(8 * 1024 * 1024))) // (256 * 1024), 1
+) * 256 * 1024
+
+# Static config resolved once at import; __init__ otherwise repeats the env
+# and filesystem lookups every time a manager is constructed
+BUCKET_NAME = os.getenv("GCP_BUCKET_NAME", "collaborative-app-files-board-sync-466501")
+KEY_FILE = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "board-sync-466501-c38a2cead941.json")
+_KEY_FILE_EXISTS = os.path.exists(KEY_FILE)
+
+# Extension -> sniffed content type, filled on demand; blank or octet-stream
+# types from the browser defeat CDN/browser content handling downstream
+_CONTENT_TYPE_CACHE: Dict[str, str] = {}
+
+@functools.lru_cache(maxsize=1)
+def _load_service_account_credentials(key_file: str):
+    """Parse the service-account key file once per process.
+
+    The expensive part is the PEM/RSA key construction inside cryptography;
+    every pooled client (and any re-instantiated StorageManager) can share
+    the parsed credentials object.
+    """
+    return service_account.Credentials.from_service_account_file(key_file)
 
 class StorageManager:
     def __init__(self):
         # Initialize GCP Storage client with service account credentials
         self.client = None
-        self.bucket_name = os.getenv("GCP_BUCKET_NAME", "collaborative-app-files-board-sync-466501")
+        self.bucket_name = BUCKET_NAME
         self.bucket = None
         
-        # Try to initialize GCP Storage client
+        # Each client owns its own auth session and connection pool, so a
+        # small round-robin pool lets concurrent uploads scale past the lock
+        # contention of a single shared session
+        self._clients = []
+        self._buckets = []
+        self._rr = itertools.count()
+
+        # Try to initialize GCP Storage clients
         try:
+            pool_size = int(os.getenv("GCS_CLIENT_POOL_SIZE", "4"))
             # Try service account JSON first (for local development)
-            key_file = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "board-sync-466501-c38a2cead941.json")
-            if os.path.exists(key_file):
-                self.client = storage.Client.from_service_account_json(key_file)
-                print(f"✅ GCP Storage initialized with service account: {key_file}")
+            if _KEY_FILE_EXISTS:
+                credentials = _load_service_account_credentials(KEY_FILE)
+                self._clients = [
+                    storage.Client(credentials=credentials, project=credentials.project_id)
+                    for _ in range(pool_size)
+                ]
+                logger.info("✅ GCP Storage initialized with service account: %s", KEY_FILE)
             else:
                 # Use default credentials (for Cloud Run)
-                self.client = storage.Client()
-                print("✅ GCP Storage initialized with default credentials (Cloud Run)")
-            
-        # Try to get or create bucket
-            self.bucket = self.client.bucket(self.bucket_name)
-            if not self.bucket.exists():
-                self.bucket = self.client.create_bucket(self.bucket_name)
-            print("✅ GCP Storage initialized successfully")
+                self._clients = [storage.Client() for _ in range(pool_size)]
+                logger.info("✅ GCP Storage initialized with default credentials (Cloud Run)")
+
+            for client in self._clients:
+                self._widen_http_pool(client)
+            self._buckets = [client.bucket(self.bucket_name) for client in self._clients]
+
+            # Keep .client/.bucket as the primary handles for existing callers.
+            # bucket() is a cheap local handle — no exists() probe here, so
+            # cold start skips a synchronous GCS round trip; existence is
+            # verified lazily on the first upload instead
+            self.client = self._clients[0]
+            self.bucket = self._buckets[0]
+            self._bucket_verified = False
+            # Capture the signing credentials once; generate_signed_url
+            # otherwise re-resolves them on every call
+            self._signing_credentials = self.client._credentials
+            logger.info("✅ GCP Storage initialized successfully")
         except Exception as e:
-            print(f"⚠️  Warning: Could not initialize GCP Storage: {e}")
-            print("📁 File uploads will be disabled for local development.")
-            print("🔧 To enable file uploads, set up GCP credentials or use GCP_BUCKET_NAME environment variable.")
+            logger.warning("⚠️  Could not initialize GCP Storage: %s", e)
+            logger.warning("📁 File uploads will be disabled for local development.")
+            logger.warning("🔧 To enable file uploads, set up GCP credentials or use GCP_BUCKET_NAME environment variable.")
             self.client = None
             self.bucket = None
+            self._clients = []
+            self._buckets = []
+            self._signing_credentials = None
+
+        # Signed-URL generation is dominated by the RSA signing step, not
+        # network, so cache URLs and reuse each one for up to half its
+        # validity window
+        self._signed_url_cache: Dict[tuple, str] = {}
+
+        # Cap concurrent blocking transfers so worker threads and GCS
+        # connections stay within the configured HTTP pool size
+        self._transfer_sem = asyncio.Semaphore(int(os.getenv("GCS_MAX_INFLIGHT", "32")))
+
+    @staticmethod
+    def _widen_http_pool(client):
+        """Raise the urllib3 pool size on the client's authorized session.
+
+        The default requests adapter keeps only 10 connections, so under
+        concurrent uploads extra connections get discarded ("Connection pool
+        is full") and GCS I/O serializes behind the cap.
+        """
+        try:
+            pool_size = int(os.getenv("GCP_HTTP_POOL_SIZE", "64"))
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=pool_size,
+                pool_maxsize=pool_size,
+                max_retries=3
+            )
+            client._http.mount("https://", adapter)
+            client._http.mount("http://", adapter)
+        except Exception as e:
+            logger.warning("⚠️  Could not resize GCS HTTP connection pool: %s", e)
+
+    def _next_bucket(self):
+        """Round-robin across the client pool's bucket handles"""
+        return self._buckets[next(self._rr) % len(self._buckets)]
 
     async def upload_file(self, file: UploadFile) -> str:
         """Upload file to GCP Storage and return public URL"""
-        print(f"🔧 Storage upload started for: {file.filename}")
+        logger.debug("🔧 Storage upload started for: %s", file.filename)
         
         if not self.bucket:
-            print("❌ No bucket available")
+            logger.error("❌ No bucket available")
             raise Exception("GCP Storage not configured. File uploads are disabled for local development. Set up GCP credentials to enable file uploads.")
         
-        # Generate unique filename
-        file_extension = file.filename.split('.')[-1] if '.' in file.filename else ''
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        print(f"📝 Generated filename: {unique_filename}")
-        
-        # Create blob
-        blob = self.bucket.blob(unique_filename)
-        print(f"📦 Created blob: {blob.name}")
-        
-        # Set content type
-        blob.content_type = file.content_type
-        print(f"📋 Set content type: {file.content_type}")
-        
-        # Upload file
-        print("📤 Reading file content...")
-        content = await file.read()
-        print(f"📊 File size: {len(content)} bytes")
-        
-        print("📤 Uploading to GCP Storage...")
-        # Use upload_from_file with BytesIO to properly handle content type
-        from io import BytesIO
-        file_obj = BytesIO(content)
-        blob.upload_from_file(file_obj, content_type=file.content_type)
-        print("✅ Upload completed")
-        
-        # Make blob publicly readable
-        print("🔓 Making blob public...")
-        blob.make_public()
-        print(f"✅ Blob is public: {blob.public_url}")
+        # Generate unique filename; splitext handles dotless names correctly
+        # (split('.')[-1] returned the whole filename) and token_urlsafe is
+        # cheaper than a hyphenated uuid4 string
+        _, file_extension = os.path.splitext(file.filename or "")
+        unique_filename = f"{secrets.token_urlsafe(16)}{file_extension}"
+        logger.debug("📝 Generated filename: %s", unique_filename)
         
+        # Create blob on the next pooled client
+        blob = self._next_bucket().blob(unique_filename)
+        blob.chunk_size = UPLOAD_CHUNK_SIZE
+
+        # Set content type, sniffing from the extension when the browser sent
+        # nothing useful
+        content_type = file.content_type
+        if not content_type or content_type == "application/octet-stream":
+            content_type = _CONTENT_TYPE_CACHE.get(file_extension)
+            if content_type is None:
+                content_type = mimetypes.guess_type(f"x{file_extension}")[0] or "application/octet-stream"
+                _CONTENT_TYPE_CACHE[file_extension] = content_type
+        blob.content_type = content_type
+
+        # Object names are random and never rewritten, so browsers/CDNs can
+        # cache them forever — repeat views skip GCS (and its egress) entirely
+        blob.cache_control = "public, max-age=31536000, immutable"
+
+        # Stream the upload straight from the spooled temp file — the client
+        # library reads it in chunks, so memory stays O(chunk) instead of
+        # O(file size) per concurrent upload
+        logger.debug("📤 Uploading to GCP Storage...")
+        size = getattr(file, "size", None)
+        def _do_upload():
+            if size and size >= MPU_THRESHOLD_BYTES:
+                # Large files: multipart upload overlaps several connections
+                # instead of pushing one stream through a single TLS pipe
+                self._upload_large(file, blob)
+            else:
+                # predefined_acl makes the object public in the same request,
+                # saving the setObjectAcl round trip make_public() would cost
+                # (ignored if the bucket ever moves to uniform bucket-level
+                # access, in which case bucket IAM governs visibility)
+                blob.upload_from_file(
+                    file.file,
+                    content_type=blob.content_type,
+                    rewind=True,
+                    predefined_acl="publicRead"
+                )
+
+        # The client library is synchronous, so run the transfer in a worker
+        # thread — otherwise a multi-second upload stalls every other
+        # coroutine on the event loop. The semaphore keeps the number of
+        # in-flight transfers below the HTTP pool size so connections aren't
+        # thrashed under burst load.
+        async with self._transfer_sem:
+            try:
+                await asyncio.to_thread(_do_upload)
+            except NotFound:
+                if self._bucket_verified:
+                    raise
+                # First 404 after boot: the bucket doesn't exist yet. Create it
+                # and retry once (init no longer probes existence at startup).
+                logger.warning("🪣 Bucket %s not found, creating it", self.bucket_name)
+                await asyncio.to_thread(self.client.create_bucket, self.bucket_name)
+                await asyncio.to_thread(_do_upload)
+        self._bucket_verified = True
+        logger.debug("✅ Upload completed: %s", blob.public_url)
+
         return blob.public_url
 
+    def _upload_large(self, file: UploadFile, blob) -> None:
+        """Upload a large file as a concurrent multipart upload.
+
+        transfer_manager needs a path on disk, so the spooled upload is
+        written out to a temp file first (past the threshold the spool has
+        rolled over to disk anyway, so this is a local disk-to-disk copy).
+        """
+        from google.cloud.storage import transfer_manager
+
+        file.file.seek(0)
+        with tempfile.NamedTemporaryFile(delete=False) as tmp:
+            shutil.copyfileobj(file.file, tmp, length=1 << 20)
+            tmp_path = tmp.name
+        try:
+            transfer_manager.upload_chunks_concurrently(
+                tmp_path,
+                blob,
+                chunk_size=16 * 1024 * 1024,
+                max_workers=8
+            )
+            # The multipart API has no predefined-ACL parameter, so the rare
+            # large upload pays the extra ACL round trip
+            blob.make_public()
+        except Exception as e:
+            logger.warning("⚠️  Multipart upload failed (%s), falling back to single-stream upload", e)
+            blob.upload_from_file(
+                file.file,
+                content_type=blob.content_type,
+                rewind=True,
+                predefined_acl="publicRead"
+            )
+        finally:
+            os.unlink(tmp_path)
+
     def generate_signed_url(self, filename: str, expiration_minutes: int = 60) -> Optional[str]:
         """Generate a signed URL for private file access"""
         if not self.bucket:
             return None
-        
+
+        # The time bucket advances every half-validity period, so a cache hit
+        # always returns a URL with at least half its lifetime remaining
+        time_bucket = int(time.time() // max(expiration_minutes * 30, 1))
+        cache_key = (filename, expiration_minutes, time_bucket)
+        cached = self._signed_url_cache.get(cache_key)
+        if cached:
+            return cached
+
         try:
             blob = self.bucket.blob(filename)
-            expiration = datetime.now() + timedelta(minutes=expiration_minutes)
-            
+
+            # A timedelta expiration skips the wall-clock + timezone lookup,
+            # and the cached credentials skip per-call credential resolution
             url = blob.generate_signed_url(
                 version="v4",
-                expiration=expiration,
-                method="GET"
+                expiration=timedelta(minutes=expiration_minutes),
+                method="GET",
+                credentials=self._signing_credentials
             )
+            # Crude size cap: dump everything rather than tracking LRU order;
+            # entries also age out naturally as their time bucket rolls over
+            if len(self._signed_url_cache) >= 4096:
+                self._signed_url_cache.clear()
+            self._signed_url_cache[cache_key] = url
             return url
         except Exception as e:
-            print(f"Error generating signed URL: {e}")
+            logger.error("Error generating signed URL: %s", e)
             return None
 
     def delete_file(self, filename: str) -> bool:
@@ -101,21 +286,54 @@ class StorageManager:
             return False
         
         try:
-            blob = self.bucket.blob(filename)
+            blob = self._next_bucket().blob(filename)
             blob.delete()
             return True
         except Exception as e:
-            print(f"Error deleting file: {e}")
+            logger.error("Error deleting file: %s", e)
             return False
 
-    def list_files(self, prefix: str = "") -> list:
-        """List files in bucket with optional prefix"""
+    def delete_files(self, filenames) -> int:
+        """Delete many files using batched requests (100 deletes per batch).
+
+        Each batch is a single HTTPS round trip instead of one DELETE per
+        file, so cleanup jobs scale with the batch count, not the file count.
+        Returns the number of files whose delete was submitted successfully.
+        """
         if not self.bucket:
-            return []
-        
+            return 0
+
+        deleted = 0
+        filenames = list(filenames)
+        for start in range(0, len(filenames), 100):
+            chunk = filenames[start:start + 100]
+            try:
+                with self.client.batch():
+                    for name in chunk:
+                        self.bucket.blob(name).delete()
+                deleted += len(chunk)
+            except Exception as e:
+                logger.error("Error deleting file batch: %s", e)
+        return deleted
+
+    def list_files(self, prefix: str = "", max_results: Optional[int] = None):
+        """Yield file names in the bucket, optionally bounded by max_results.
+
+        Streams page by page instead of materializing every name, and the
+        fields mask asks GCS for names-only pages instead of full object
+        metadata, so listing stays cheap even on large buckets.
+        """
+        if not self.bucket:
+            return
+
         try:
-            blobs = self.bucket.list_blobs(prefix=prefix)
-            return [blob.name for blob in blobs]
+            blobs = self.bucket.list_blobs(
+                prefix=prefix,
+                max_results=max_results,
+                fields="items(name),nextPageToken",
+                page_size=1000
+            )
+            for blob in blobs:
+                yield blob.name
         except Exception as e:
-            print(f"Error listing files: {e}")
-            return [] 
\ No newline at end of file
+            logger.error("Error listing files: %s", e)
\ No newline at end of file
@@ -1,28 +1,108 @@
 from fastapi import WebSocket
-from typing import Dict, List, Set, Any
-import json
+from collections import OrderedDict
+from typing import Dict, List, Set, Any, Tuple
+import heapq
+import msgpack
+import orjson
 import uuid
 import os
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from .firestore_manager import FirestoreManager
 import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Broadcast envelopes don't need sub-50ms timestamp precision, so the
+# formatted string is reused across messages in the same window instead of
+# paying gettimeofday plus an isoformat allocation per frame
+_iso_cached = ""
+_iso_cached_at = 0.0
+
+def _now_iso() -> str:
+    global _iso_cached, _iso_cached_at
+    now = time.monotonic()
+    if now - _iso_cached_at > 0.05:
+        _iso_cached = datetime.now().isoformat()
+        _iso_cached_at = now
+    return _iso_cached
+
+def _now_ms() -> int:
+    """Epoch milliseconds — far cheaper than datetime.now().isoformat()
+    and serializes as a small integer instead of a 26-char string"""
+    return time.time_ns() // 1_000_000
 
 class ConnectionManager:
+    # Names the server assigns when a client connects without one; several
+    # paths treat these users as ephemeral
+    _AUTO_USER_PREFIX = "User "
+
+    # Bounds on the in-memory in-progress stroke buffers: a client that
+    # starts strokes without ending them (or streams points forever) would
+    # otherwise grow active_strokes without limit
+    _MAX_ACTIVE_STROKES = 256
+    _MAX_STROKE_POINTS = 8192
+    _STROKE_POINTS_KEEP = 4096
+    _STALE_STROKE_SECONDS = 300
+
+    # get_room_info results are served from a short cache between membership
+    # changes; joins/leaves invalidate eagerly so the staleness window only
+    # covers identical repeat reads
+    _ROOM_INFO_TTL = 2.0
+
+    # Stroke points are coalesced per sender and flushed at ~60Hz; one frame
+    # per flush instead of one frame per mouse-move event
+    _POINT_FLUSH_SECONDS = 0.016
+
+    # Chat persistence batching: messages queue briefly and go to Firestore
+    # as one WriteBatch commit, at most this many per commit
+    _CHAT_FLUSH_SECONDS = 0.1
+    _CHAT_BATCH_SIZE = 50
+
     def __init__(self, firestore_manager=None):
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+        self.active_connections: Dict[str, Set[WebSocket]] = {}
         self.room_users: Dict[str, Set[str]] = {}
         self.user_rooms: Dict[str, str] = {}  # user_id -> room_id
         self.user_names: Dict[str, str] = {}  # user_id -> user_name
         self.connection_users: Dict[WebSocket, Dict] = {}  # websocket -> user_info
+        self.user_connections: Dict[Tuple[str, str], Set[WebSocket]] = {}  # (room_id, user_id) -> websockets
+        self._auto_users: Set[Tuple[str, str, WebSocket]] = set()  # (room_id, user_id, websocket) of placeholder users
+        self._username_connections: Dict[str, Set[WebSocket]] = {}  # user_name -> websockets
+        self._room_name_index: Dict[str, Set[str]] = {}  # room_id -> connected user names
         self.canvas_states: Dict[str, List[Dict[str, Any]]] = {}
-        self.active_strokes: Dict[str, Dict[str, Dict]] = {}  # room_id -> stroke_id -> stroke_data
+        self.active_strokes: Dict[str, "OrderedDict[str, Dict]"] = {}  # room_id -> stroke_id -> stroke_data
+        self._stroke_started: Dict[str, Dict[str, datetime]] = {}  # room_id -> stroke_id -> start time
+        self._pending_points: Dict[str, Dict[WebSocket, Dict[str, List[dict]]]] = {}  # room -> sender -> stroke -> points
+        self._room_info_cache: Dict[str, tuple] = {}  # room_id -> (expires_at, info dict)
+        self._room_summary: Dict[str, Dict] = {}  # room_id -> denormalized room metadata
+        self._pending_chat: List[Dict] = []  # chat messages awaiting the batched Firestore write
+        self._chat_flush_task = None
+        self._point_flush_tasks: Dict[str, asyncio.Task] = {}  # room_id -> flush task
         self.empty_rooms_scheduled: Dict[str, datetime] = {}
+        self._cleanup_heap: List[tuple] = []  # (cleanup_at, room_id, scheduled_time)
+        # Canvas persistence is debounced: broadcasts mark rooms dirty and a
+        # background task flushes each dirty room at most every couple of
+        # seconds instead of rewriting the whole canvas per stroke
+        self._dirty_rooms: Set[str] = set()
+        self._pending_strokes: Dict[str, List[Dict]] = {}  # room_id -> strokes awaiting append
+        self._canvas_flush_task = None
+        self._bg_tasks: Set[asyncio.Task] = set()  # keeps fire-and-forget tasks alive
+        # Cap concurrent background Firestore writes so a burst of dirty
+        # rooms can't exhaust the thread pool the endpoints share
+        self._firestore_sem = asyncio.Semaphore(int(os.getenv("FIRESTORE_MAX_INFLIGHT", "8")))
         self.last_cleanup_time = datetime.now()
         self._disconnecting: Set[WebSocket] = set()  # Prevent recursive disconnect calls
+        self.binary_connections: Set[WebSocket] = set()  # connections that opted into MessagePack frames
         
         # NEW: Heartbeat tracking for connection health
         self.connection_heartbeats: Dict[WebSocket, datetime] = {}  # websocket -> last_heartbeat
+        self._heartbeat_tasks: Dict[WebSocket, asyncio.Task] = {}  # websocket -> ping task
+        self.heartbeat_interval_seconds = int(os.getenv("WEBSOCKET_PING_INTERVAL", "20"))
         self.connection_timeout_minutes = int(os.getenv("WEBSOCKET_CONNECTION_TIMEOUT", "300000")) // 60000  # Convert milliseconds to minutes
+        # Read once; the cleanup paths previously re-parsed this env var on
+        # every tick
+        self.room_cleanup_delay_min = int(os.getenv("ROOM_CLEANUP_DELAY", "300")) // 60
         
         # Use provided FirestoreManager or create new one
         if firestore_manager:
@@ -31,17 +111,25 @@ class ConnectionManager:
             from .firestore_manager import FirestoreManager
             self.firestore_manager = FirestoreManager()
         
-        print("🔄 ConnectionManager initialized with cleanup system and heartbeat tracking")
+        logger.info("🔄 ConnectionManager initialized with cleanup system and heartbeat tracking")
 
     async def _cleanup_scheduler(self):
-        """Scheduler that runs every minute to clean up empty rooms after 5 minutes and stale connections"""
+        """Scheduler that wakes for the next due room cleanup (at most every minute) and stale connections"""
         while True:
             try:
-                await asyncio.sleep(60)  # Run every minute
+                # Sleep until the earliest scheduled cleanup instead of a
+                # fixed interval, capped at a minute for the stale-connection
+                # sweep
+                sleep_seconds = 60.0
+                if self._cleanup_heap:
+                    until_due = (self._cleanup_heap[0][0] - datetime.now()).total_seconds()
+                    sleep_seconds = min(sleep_seconds, max(until_due, 1.0))
+                await asyncio.sleep(sleep_seconds)
                 await self._cleanup_empty_rooms()
                 await self._cleanup_stale_connections()
+                self._sweep_stale_strokes()
             except Exception as e:
-                print(f"Error in cleanup scheduler: {e}")
+                logger.error(f"Error in cleanup scheduler: {e}")
 
     async def _cleanup_stale_connections(self):
         """Clean up connections that haven't sent a heartbeat in the timeout period"""
@@ -54,19 +142,16 @@ class ConnectionManager:
                 stale_connections.append(websocket)
         
         if stale_connections:
-            print(f"🧹 Found {len(stale_connections)} stale connections (no heartbeat for {self.connection_timeout_minutes}+ minutes)")
+            logger.info(f"🧹 Found {len(stale_connections)} stale connections (no heartbeat for {self.connection_timeout_minutes}+ minutes)")
             
             for websocket in stale_connections:
                 try:
-                    # Find which room this connection belongs to
-                    room_id = None
-                    for room, connections in self.active_connections.items():
-                        if websocket in connections:
-                            room_id = room
-                            break
-                    
+                    # connection_users already records the room — no need to
+                    # scan every room's connection list
+                    room_id = self.connection_users.get(websocket, {}).get("room_id")
+
                     if room_id:
-                        print(f"🔄 Disconnecting stale connection from room {room_id}")
+                        logger.info(f"🔄 Disconnecting stale connection from room {room_id}")
                         try:
                             # Send a specific close code for stale connections
                             await websocket.close(code=4002, reason="Connection timeout - no heartbeat received")
@@ -79,59 +164,109 @@ class ConnectionManager:
                         if websocket in self.connection_heartbeats:
                             del self.connection_heartbeats[websocket]
                         if websocket in self.connection_users:
+                            self._unindex_connection(websocket)
                             del self.connection_users[websocket]
                             
                 except Exception as e:
-                    print(f"❌ Error cleaning up stale connection: {e}")
+                    logger.error(f"❌ Error cleaning up stale connection: {e}")
                     # Remove from tracking even if disconnect fails
                     if websocket in self.connection_heartbeats:
                         del self.connection_heartbeats[websocket]
                     if websocket in self.connection_users:
+                        self._unindex_connection(websocket)
                         del self.connection_users[websocket]
         else:
-            print(f"✅ No stale connections found. Active connections: {len(self.connection_heartbeats)}")
+            logger.debug("✅ No stale connections found. Active connections: %d", len(self.connection_heartbeats))
+
+    async def _heartbeat_loop(self, websocket: WebSocket, room_id: str):
+        """Ping one connection periodically; disconnect it when a send fails.
+
+        Dead connections otherwise linger until the minute-level stale sweep
+        notices the missing client heartbeat, holding room slots and eating
+        broadcast time on every message in between.
+        """
+        ping_payload = orjson.dumps({"type": "ping"}).decode()
+        try:
+            while True:
+                await asyncio.sleep(self.heartbeat_interval_seconds)
+                try:
+                    await asyncio.wait_for(websocket.send_text(ping_payload), timeout=5)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.info(f"💔 Heartbeat ping failed, disconnecting from {room_id}")
+                    await self.disconnect(websocket, room_id)
+                    return
+        except asyncio.CancelledError:
+            pass
+
+    def _sweep_stale_strokes(self):
+        """Drop in-progress strokes whose stroke_end never arrived"""
+        cutoff = datetime.now() - timedelta(seconds=self._STALE_STROKE_SECONDS)
+        for room_id in list(self._stroke_started.keys()):
+            started = self._stroke_started[room_id]
+            for stroke_id in [sid for sid, t in started.items() if t < cutoff]:
+                started.pop(stroke_id, None)
+                self.active_strokes.get(room_id, {}).pop(stroke_id, None)
+                logger.debug("🧹 Dropped stale stroke %s in %s", stroke_id, room_id)
+            if not started:
+                del self._stroke_started[room_id]
+
+    def _due_rooms(self, current_time: datetime) -> List[str]:
+        """Pop rooms whose cleanup deadline has passed off the schedule heap"""
+        due = []
+        while self._cleanup_heap and self._cleanup_heap[0][0] <= current_time:
+            _, room_id, scheduled_time = heapq.heappop(self._cleanup_heap)
+            # Skip entries cancelled by a rejoin or superseded by a newer
+            # schedule for the same room (lazy deletion)
+            if self.empty_rooms_scheduled.get(room_id) == scheduled_time:
+                due.append(room_id)
+        return due
 
     async def _cleanup_empty_rooms(self):
-        """Clean up rooms that have been empty for 5+ minutes"""
-        from datetime import timedelta
-        room_cleanup_delay = int(os.getenv("ROOM_CLEANUP_DELAY", "300")) // 60  # Convert seconds to minutes
-        cutoff_time = datetime.now() - timedelta(minutes=room_cleanup_delay)
-        
-        rooms_to_cleanup = []
-        for room_id, scheduled_time in self.empty_rooms_scheduled.items():
-            if scheduled_time < cutoff_time:
-                rooms_to_cleanup.append(room_id)
-        
-        for room_id in rooms_to_cleanup:
-            room_cleanup_delay = int(os.getenv("ROOM_CLEANUP_DELAY", "300")) // 60
-            print(f"🧹 Cleaning up room {room_id} (empty for {room_cleanup_delay}+ minutes)")
+        """Clean up rooms whose scheduled cleanup deadline has passed"""
+        for room_id in self._due_rooms(datetime.now()):
+            logger.info(f"🧹 Cleaning up room {room_id} (empty for {self.room_cleanup_delay_min}+ minutes)")
             await self._cleanup_room_data(room_id)
-            del self.empty_rooms_scheduled[room_id]
+            # pop: the manual trigger path may already have removed it
+            self.empty_rooms_scheduled.pop(room_id, None)
 
     async def _cleanup_room_data(self, room_id: str):
         """Clean up all data for a specific room"""
         try:
             # Clean up in-memory data
+            self._dirty_rooms.discard(room_id)
+            self._pending_strokes.pop(room_id, None)
             if room_id in self.canvas_states:
                 del self.canvas_states[room_id]
             if room_id in self.active_strokes:
                 del self.active_strokes[room_id]
+            self._stroke_started.pop(room_id, None)
+            self._pending_points.pop(room_id, None)
+            self._invalidate_room_info(room_id)
+            self._room_name_index.pop(room_id, None)
+            self._room_summary.pop(room_id, None)
             if room_id in self.room_users:
                 del self.room_users[room_id]
             
             # Clean up Firestore data
             self.firestore_manager.cleanup_room_data(room_id)
             
-            print(f"✅ Cleaned up room {room_id}")
+            logger.info(f"✅ Cleaned up room {room_id}")
         except Exception as e:
-            print(f"❌ Error cleaning up room {room_id}: {e}")
+            logger.error(f"❌ Error cleaning up room {room_id}: {e}")
 
     def _schedule_room_cleanup(self, room_id: str):
         """Schedule a room for cleanup in 5 minutes"""
-        self.empty_rooms_scheduled[room_id] = datetime.now()
-        room_cleanup_delay = int(os.getenv("ROOM_CLEANUP_DELAY", "300")) // 60
-        print(f"📅 Scheduled cleanup: {room_id} ({room_cleanup_delay}min)")
-        print(f"📊 Scheduled rooms: {list(self.empty_rooms_scheduled.keys())}")
+        from datetime import timedelta
+        scheduled_time = datetime.now()
+        self.empty_rooms_scheduled[room_id] = scheduled_time
+        heapq.heappush(
+            self._cleanup_heap,
+            (scheduled_time + timedelta(minutes=self.room_cleanup_delay_min), room_id, scheduled_time)
+        )
+        logger.info(f"📅 Scheduled cleanup: {room_id} ({self.room_cleanup_delay_min}min)")
+        logger.debug("📊 Scheduled rooms: %s", self.empty_rooms_scheduled.keys())
 
     def trigger_cleanup_if_needed(self):
         """Manually trigger cleanup if enough time has passed"""
@@ -140,205 +275,288 @@ class ConnectionManager:
         
         # Check if it's time to run cleanup (every minute)
         if current_time - self.last_cleanup_time > timedelta(minutes=1):
-            print(f"🕐 Cleanup check triggered")
+            logger.debug("🕐 Cleanup check triggered")
             self.last_cleanup_time = current_time
             
             # First, clean up stuck auto-generated users
             self._cleanup_stuck_auto_users()
             
-            # Run cleanup synchronously
-            room_cleanup_delay = int(os.getenv("ROOM_CLEANUP_DELAY", "300")) // 60
-            cutoff_time = current_time - timedelta(minutes=room_cleanup_delay)
-            rooms_to_cleanup = []
-            
-            for room_id, scheduled_time in self.empty_rooms_scheduled.items():
-                if scheduled_time < cutoff_time:
-                    rooms_to_cleanup.append(room_id)
-            
+            # Run cleanup synchronously; the heap hands back exactly the
+            # rooms whose deadline has passed
+            rooms_to_cleanup = self._due_rooms(current_time)
+
             if rooms_to_cleanup:
-                print(f"🧹 Cleaning up {len(rooms_to_cleanup)} rooms: {rooms_to_cleanup}")
+                logger.info(f"🧹 Cleaning up {len(rooms_to_cleanup)} rooms: {rooms_to_cleanup}")
                 for room_id in rooms_to_cleanup:
-                    print(f"🧹 Cleaning up: {room_id}")
+                    logger.info(f"🧹 Cleaning up: {room_id}")
                     self._cleanup_room_data_sync(room_id)
-                    del self.empty_rooms_scheduled[room_id]
+                    self.empty_rooms_scheduled.pop(room_id, None)
             else:
-                print(f"ℹ️ No rooms ready for cleanup")
+                logger.debug("ℹ️ No rooms ready for cleanup")
 
     def _cleanup_room_data_sync(self, room_id: str):
         """Synchronous version of room data cleanup"""
         try:
-            print(f"🧹 Cleaning up: {room_id}")
+            logger.info(f"🧹 Cleaning up: {room_id}")
             
             # Clean up in-memory data
+            self._dirty_rooms.discard(room_id)
+            self._pending_strokes.pop(room_id, None)
             if room_id in self.canvas_states:
                 del self.canvas_states[room_id]
             if room_id in self.active_strokes:
                 del self.active_strokes[room_id]
+            self._stroke_started.pop(room_id, None)
+            self._pending_points.pop(room_id, None)
+            self._invalidate_room_info(room_id)
+            self._room_name_index.pop(room_id, None)
+            self._room_summary.pop(room_id, None)
             if room_id in self.room_users:
                 del self.room_users[room_id]
             
             # Clean up Firestore data
             success = self.firestore_manager.cleanup_room_data(room_id)
             if success:
-                print(f"✅ Cleaned up: {room_id}")
+                logger.info(f"✅ Cleaned up: {room_id}")
             else:
-                print(f"❌ Failed to clean up: {room_id}")
+                logger.error(f"❌ Failed to clean up: {room_id}")
                 
         except Exception as e:
-            print(f"❌ Error cleaning up {room_id}: {e}")
+            logger.error(f"❌ Error cleaning up {room_id}: {e}")
             import traceback
             traceback.print_exc()
 
     def _cleanup_stuck_auto_users(self):
-        """Clean up auto-generated users that are stuck in rooms"""
+        """Clean up auto-generated users that are stuck in rooms.
+
+        Walks the _auto_users index instead of every connection in every
+        room, so the sweep costs O(auto users) rather than O(connections).
+        """
         try:
-            for room_id in list(self.active_connections.keys()):
-                if room_id not in self.active_connections:
-                    continue
-                    
-                connections_to_remove = []
-                for ws in self.active_connections[room_id]:
-                    if ws in self.connection_users:
-                        user_info = self.connection_users[ws]
-                        user_name = user_info.get("name", "")
-                        user_id = user_info.get("id", "")
-                        
-                        # If it's an auto-generated user, mark for removal
-                        if user_name.startswith("User "):
-                            print(f"🧹 Removing stuck auto-user: {user_name} from {room_id}")
-                            connections_to_remove.append(ws)
-                            
-                            # Remove from room_users and Firestore
-                            if room_id in self.room_users:
-                                self.room_users[room_id].discard(user_id)
-                            self.firestore_manager.remove_user_from_room(room_id, user_id)
+            touched_rooms = set()
+            for room_id, user_id, ws in list(self._auto_users):
+                user_name = self.connection_users.get(ws, {}).get("name", "")
+                logger.info(f"🧹 Removing stuck auto-user: {user_name} from {room_id}")
                 
-                # Remove the connections
-                for ws in connections_to_remove:
-                    if ws in self.active_connections[room_id]:
-                        self.active_connections[room_id].remove(ws)
-                    if ws in self.connection_users:
-                        del self.connection_users[ws]
+                # Remove from room_users and Firestore
+                if room_id in self.room_users:
+                    self.room_users[room_id].discard(user_id)
+                self.firestore_manager.remove_user_from_room(room_id, user_id)
+                self._invalidate_room_info(room_id)
                 
-                # If room is now empty, schedule cleanup
+                # Remove the connection (unindexing also drops the
+                # _auto_users entry)
+                self._unindex_connection(ws)
+                self.connection_users.pop(ws, None)
+                if room_id in self.active_connections:
+                    self.active_connections[room_id].discard(ws)
+                touched_rooms.add(room_id)
+            
+            # If any room is now empty, schedule cleanup
+            for room_id in touched_rooms:
                 if room_id in self.active_connections and len(self.active_connections[room_id]) == 0:
-                    print(f"🔄 Room {room_id} is now empty after auto-user cleanup. Scheduling cleanup.")
+                    logger.info(f"🔄 Room {room_id} is now empty after auto-user cleanup. Scheduling cleanup.")
                     self._schedule_room_cleanup(room_id)
                     
         except Exception as e:
-            print(f"❌ Error cleaning up stuck auto-users: {e}")
+            logger.error(f"❌ Error cleaning up stuck auto-users: {e}")
             import traceback
             traceback.print_exc()
 
+    def _spawn(self, coro):
+        """Run a coroutine in the background, holding a reference until done.
+
+        The event loop only keeps weak references to tasks, so without the
+        set a fire-and-forget task can be garbage collected mid-flight.
+        """
+        task = asyncio.create_task(coro)
+        self._bg_tasks.add(task)
+        task.add_done_callback(self._bg_tasks.discard)
+        return task
+
+    @classmethod
+    def _is_auto_name(cls, name) -> bool:
+        """True if the name is a server-assigned placeholder like 'User abc123'"""
+        return bool(name) and name.startswith(cls._AUTO_USER_PREFIX)
+
+    def _invalidate_room_info(self, room_id: str):
+        self._room_info_cache.pop(room_id, None)
+
+    def _drop_username(self, user_name, websocket: WebSocket):
+        sockets = self._username_connections.get(user_name)
+        if sockets:
+            sockets.discard(websocket)
+            if not sockets:
+                del self._username_connections[user_name]
+
+    def _drop_room_name(self, room_id, user_name):
+        """Remove a name from the room's name index once its last
+        connection in that room is gone"""
+        for ws in self._username_connections.get(user_name, ()):
+            if self.connection_users.get(ws, {}).get("room_id") == room_id:
+                return
+        names = self._room_name_index.get(room_id)
+        if names:
+            names.discard(user_name)
+            if not names:
+                del self._room_name_index[room_id]
+
+    def _index_connection(self, websocket: WebSocket, room_id: str, user_id: str):
+        """Record a websocket under its (room, user) key for O(1) lookups"""
+        self.user_connections.setdefault((room_id, user_id), set()).add(websocket)
+
+    def _unindex_connection(self, websocket: WebSocket):
+        """Remove a websocket from the (room, user) index"""
+        user_info = self.connection_users.get(websocket)
+        if not user_info:
+            return
+        key = (user_info.get("room_id"), user_info.get("id"))
+        self._auto_users.discard((key[0], key[1], websocket))
+        self.binary_connections.discard(websocket)
+        self._drop_username(user_info.get("name"), websocket)
+        self._drop_room_name(key[0], user_info.get("name"))
+        sockets = self.user_connections.get(key)
+        if sockets:
+            sockets.discard(websocket)
+            if not sockets:
+                del self.user_connections[key]
+
     async def connect(self, websocket: WebSocket, room_id: str, user_name: str = None):
         await websocket.accept()
         
-        # Check if room exists in Firestore - don't create automatically
-        if not self.firestore_manager.room_exists(room_id):
-            print(f"❌ Room {room_id} doesn't exist in Firestore. User must create room first.")
+        # Check if room exists in Firestore - don't create automatically.
+        # Firestore calls are synchronous network I/O, so run them off the
+        # event loop — a blocked loop stalls every room's broadcasts
+        if not await asyncio.to_thread(self.firestore_manager.room_exists, room_id):
+            logger.warning(f"❌ Room {room_id} doesn't exist in Firestore. User must create room first.")
             await websocket.close(code=4004, reason="Room does not exist")
             raise Exception(f"Room {room_id} does not exist")
         
-        if room_id not in self.active_connections:
-            self.active_connections[room_id] = []
-            self.room_users[room_id] = set()
-        
-        self.active_connections[room_id].append(websocket)
+        self.active_connections.setdefault(room_id, set()).add(websocket)
+        self.room_users.setdefault(room_id, set())
+        self._room_summary.setdefault(room_id, {
+            "name": room_id,
+            "created_at": _now_iso(),
+            "created_by": "Unknown"
+        })
         
         # Check if user with this name already exists in the room
         existing_user_id = None
         if user_name:
-            # Look for existing user with the same name in this room
-            for ws, user_info in self.connection_users.items():
-                if (user_info.get("name") == user_name and 
-                    user_info.get("room_id") == room_id and
-                    ws in self.active_connections.get(room_id, [])):
+            # Look for an existing connection with the same name in this
+            # room via the username index
+            for ws in self._username_connections.get(user_name, ()):
+                user_info = self.connection_users.get(ws, {})
+                if (user_info.get("room_id") == room_id and
+                        ws in self.active_connections.get(room_id, ())):
                     existing_user_id = user_info.get("id")
                     break
         
         if existing_user_id:
             # Reuse existing user
             user_id = existing_user_id
-            print(f"Reusing existing user '{user_name}' (ID: {user_id}) in room '{room_id}'")
+            logger.info(f"Reusing existing user '{user_name}' (ID: {user_id}) in room '{room_id}'")
             
             # Update global user status to online for rejoining users
-            if not user_name.startswith("User "):
-                self.firestore_manager.update_global_user_status(user_name, is_online=True)
-                print(f"Updated global user {user_name} status to online (rejoining)")
+            if not self._is_auto_name(user_name):
+                await asyncio.to_thread(
+                    self.firestore_manager.update_global_user_status, user_name, True
+                )
+                logger.info(f"Updated global user {user_name} status to online (rejoining)")
         else:
             # Generate new user ID if not provided
             user_id = str(uuid.uuid4())[:8]
             if not user_name:
                 user_name = f"User {user_id}"
-            print(f"Creating new user '{user_name}' (ID: {user_id}) in room '{room_id}'")
+            logger.info(f"Creating new user '{user_name}' (ID: {user_id}) in room '{room_id}'")
             
             # Check global username availability for non-auto-generated usernames
-            if not user_name.startswith("User "):
-                is_available = self.firestore_manager.is_username_available_globally(user_name)
+            if not self._is_auto_name(user_name):
+                is_available = await asyncio.to_thread(
+                    self.firestore_manager.is_username_available_globally, user_name
+                )
                 if not is_available:
                     # Username is taken globally - reject the connection instead of creating auto-user
-                    print(f"❌ Username '{user_name}' is taken globally. Rejecting connection.")
+                    logger.warning(f"❌ Username '{user_name}' is taken globally. Rejecting connection.")
                     await websocket.close(code=4001, reason="Username is already taken")
                     raise Exception(f"Username '{user_name}' is taken globally.")
                 else:
                     # Register the username globally
-                    self.firestore_manager.register_global_user(user_name, user_id, room_id)
-                    print(f"Registered global user: {user_name}")
+                    await asyncio.to_thread(
+                        self.firestore_manager.register_global_user, user_name, user_id, room_id
+                    )
+                    logger.info(f"Registered global user: {user_name}")
             
         # Store user information
         user_info = {
             "id": user_id,
             "name": user_name,
+            # Computed once at assignment; hot paths read the flag instead
+            # of re-running the prefix check
+            "is_auto": self._is_auto_name(user_name),
             "room_id": room_id,
             "joined_at": datetime.now().isoformat()
         }
         self.connection_users[websocket] = user_info
+        self._index_connection(websocket, room_id, user_id)
+        self._username_connections.setdefault(user_name, set()).add(websocket)
+        self._room_name_index.setdefault(room_id, set()).add(user_name)
+        if user_info["is_auto"]:
+            self._auto_users.add((room_id, user_id, websocket))
         
         # NEW: Initialize heartbeat tracking
         self.connection_heartbeats[websocket] = datetime.now()
+        self._heartbeat_tasks[websocket] = asyncio.create_task(
+            self._heartbeat_loop(websocket, room_id)
+        )
         
         # Add user to room
-        if room_id not in self.room_users:
-            self.room_users[room_id] = set()
         self.room_users[room_id].add(user_id)
         
-        # Only add to room_users if this is a new user
+        # Add user to Firestore only for new users
         if not existing_user_id:
-            self.room_users[room_id].add(user_id)
-            # Add user to Firestore only for new users
-            self.firestore_manager.add_user_to_room(room_id, user_id, user_name)
+            await asyncio.to_thread(
+                self.firestore_manager.add_user_to_room, room_id, user_id, user_name
+            )
+            self._invalidate_room_info(room_id)
         
         # Cancel scheduled cleanup if this room was scheduled for cleanup
         if room_id in self.empty_rooms_scheduled:
             del self.empty_rooms_scheduled[room_id]
-            print(f"✅ Cancelled cleanup for room {room_id} - user rejoined")
+            logger.info(f"✅ Cancelled cleanup for room {room_id} - user rejoined")
         
         # Debug: Print connection info
-        print(f"Room '{room_id}' has {len(self.active_connections[room_id])} connections")
-        print(f"Users: {[self.connection_users.get(ws, {}).get('name', 'Unknown') for ws in self.active_connections[room_id]]}")
+        logger.info(f"Room '{room_id}' has {len(self.active_connections[room_id])} connections")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Users: {[self.connection_users.get(ws, {}).get('name', 'Unknown') for ws in self.active_connections[room_id]]}")
         
         # Send current room info to the new user
         room_info = self.get_room_info(room_id)
-        await websocket.send_text(json.dumps({
+        await websocket.send_text(orjson.dumps({
             "type": "room_info",
             "data": room_info,
-            "timestamp": datetime.now().isoformat()
-        }))
+            "timestamp": _now_iso()
+        }).decode())
         
         # Send current canvas state to the new user
         # First try to get from in-memory state (most up-to-date)
         canvas_state = []
         if room_id in self.canvas_states:
-            canvas_state = self.canvas_states[room_id].copy()
-            print(f"📊 Canvas: {len(canvas_state)} strokes (memory) -> {user_name}")
+            # No copy needed: the list is serialized below before any await
+            # can interleave a mutation
+            canvas_state = self.canvas_states[room_id]
+            logger.debug("📊 Canvas: %d strokes (memory) -> %s", len(canvas_state), user_name)
         
         # If no in-memory state, try to load from Firestore
         if not canvas_state:
-            canvas_state = self.firestore_manager.get_canvas_state(room_id)
+            canvas_state = await asyncio.to_thread(
+                self.firestore_manager.get_canvas_state, room_id
+            )
             if canvas_state:
-                # Also load into memory for future use
-                self.canvas_states[room_id] = canvas_state.copy()
-                print(f"📊 Canvas: {len(canvas_state)} strokes (Firestore) -> {user_name}")
+                # Also load into memory for future use (the fetched list is
+                # already a fresh object, no copy needed)
+                self.canvas_states[room_id] = canvas_state
+                logger.debug("📊 Canvas: %d strokes (Firestore) -> %s", len(canvas_state), user_name)
         
         # Send canvas state to the new user
         if canvas_state:
@@ -347,23 +565,27 @@ class ConnectionManager:
                 "data": {
                     "drawings": canvas_state
                 },
-                "timestamp": datetime.now().isoformat()
+                "timestamp": _now_iso()
             }
-            await websocket.send_text(json.dumps(canvas_message))
-            print(f"✅ Canvas sent to {user_name}")
+            # The canvas snapshot is by far the largest frame we send —
+            # orjson serializes it in a fraction of stdlib json's time
+            await websocket.send_text(orjson.dumps(canvas_message).decode())
+            logger.debug("✅ Canvas sent to %s", user_name)
         else:
-            print(f"ℹ️ No canvas data for room {room_id}")
+            logger.debug("ℹ️ No canvas data for room %s", room_id)
         
-        # Only notify others if this is a new user
+        # Only notify others if this is a new user. The joining client has
+        # everything it needs at this point, so the notifications to the rest
+        # of the room run in the background instead of extending the join
         if not existing_user_id:
-            await self.broadcast_user_joined(room_id, {
+            self._spawn(self.broadcast_user_joined(room_id, {
                 "user_id": user_id,
                 "user_name": user_name,
-                "timestamp": datetime.now().isoformat()
-            }, websocket)
+                "timestamp": _now_iso()
+            }, websocket))
 
             # Send updated room info to all users in the room
-            await self.broadcast_room_info(room_id)
+            self._spawn(self.broadcast_room_info(room_id))
 
     async def disconnect(self, websocket: WebSocket, room_id: str):
         # Prevent recursive disconnect calls
@@ -374,37 +596,39 @@ class ConnectionManager:
         
         try:
             if room_id in self.active_connections:
-                if websocket in self.active_connections[room_id]:
-                    self.active_connections[room_id].remove(websocket)
+                self.active_connections[room_id].discard(websocket)
                 
                 # Remove user from room
                 if websocket in self.connection_users:
                     user_id = self.connection_users[websocket]["id"]
                     user_name = self.connection_users[websocket].get("name", f"User {user_id}")
-                    print(f"User {user_name} (ID: {user_id}) leaving room {room_id}")
+                    logger.info(f"User {user_name} (ID: {user_id}) leaving room {room_id}")
                     
-                    # Check if this user has other active connections in the same room
-                    other_connections = [
-                        ws for ws in self.active_connections[room_id]
-                        if ws in self.connection_users and 
-                        self.connection_users[ws].get("id") == user_id
-                    ]
+                    # Check if this user has other active connections in the
+                    # same room — index lookup, not a scan of every connection
+                    self._unindex_connection(websocket)
+                    other_connections = self.user_connections.get((room_id, user_id), set())
                     
                     # Always remove auto-generated users immediately
-                    is_auto_generated = user_name.startswith("User ")
+                    is_auto_generated = self.connection_users[websocket].get(
+                        "is_auto", self._is_auto_name(user_name)
+                    )
                     
                     # For auto-generated users, always remove them immediately
                     if is_auto_generated:
-                        print(f"🧹 Removing auto-generated user {user_name} immediately")
+                        logger.info(f"🧹 Removing auto-generated user {user_name} immediately")
                         if room_id in self.room_users:
                             self.room_users[room_id].discard(user_id)
-                        self.firestore_manager.remove_user_from_room(room_id, user_id)
+                        await asyncio.to_thread(
+                            self.firestore_manager.remove_user_from_room, room_id, user_id
+                        )
+                        self._invalidate_room_info(room_id)
                         
                         # Notify others that user left
                         await self.broadcast_user_left(room_id, {
                             "user_id": user_id,
                             "user_name": user_name,
-                            "timestamp": datetime.now().isoformat()
+                            "timestamp": _now_iso()
                         }, websocket)
                         
                         # Send updated room info to remaining users
@@ -416,26 +640,30 @@ class ConnectionManager:
                                 self.room_users[room_id].discard(user_id)
                             
                             # Remove user from Firestore
-                            self.firestore_manager.remove_user_from_room(room_id, user_id)
+                            await asyncio.to_thread(
+                                self.firestore_manager.remove_user_from_room, room_id, user_id
+                            )
                             
                             # Update global user status to offline instead of unregistering
                             # This allows the user to rejoin with the same username
-                            self.firestore_manager.update_global_user_status(user_name, is_online=False)
-                            print(f"Updated global user {user_name} status to offline")
+                            await asyncio.to_thread(
+                                self.firestore_manager.update_global_user_status, user_name, False
+                            )
+                            self._invalidate_room_info(room_id)
+                            logger.info(f"Updated global user {user_name} status to offline")
                             
                             # Notify others that user left
                             await self.broadcast_user_left(room_id, {
                                 "user_id": user_id,
                                 "user_name": user_name,
-                                "timestamp": datetime.now().isoformat()
+                                "timestamp": _now_iso()
                             }, websocket)
                             
                             # Send updated room info to remaining users
-                            room_info = self.get_room_info(room_id)
-                            print(f"Room {room_id} now has {room_info['count']} users: {[u.get('name', 'Unknown') for u in room_info['users']]}")
+                            logger.debug("Room %s now has %d users", room_id, len(self.room_users.get(room_id, ())))
                             await self.broadcast_room_info(room_id)
                         else:
-                            print(f"User {user_name} still has {len(other_connections)} other connections in room {room_id}")
+                            logger.debug("User %s still has %d other connections in room %s", user_name, len(other_connections), room_id)
                     
                     del self.connection_users[websocket]
                 
@@ -448,40 +676,45 @@ class ConnectionManager:
                             user_info = self.connection_users[ws]
                             user_name = user_info.get("name", "")
                             # Separate real users from auto-generated users
-                            if user_name.startswith("User "):
+                            if user_info.get("is_auto"):
                                 auto_users_in_room.append(user_name)
                             else:
                                 real_users_in_room.append(user_name)
                 
                 # If there are only auto-generated users, remove them immediately
                 if len(real_users_in_room) == 0 and len(auto_users_in_room) > 0:
-                    print(f"🧹 Room {room_id} has only auto-generated users. Removing them immediately.")
+                    logger.info(f"🧹 Room {room_id} has only auto-generated users. Removing them immediately.")
                     # Remove all auto-generated users
                     for ws in list(self.active_connections[room_id]):
                         if ws in self.connection_users:
                             user_info = self.connection_users[ws]
                             user_name = user_info.get("name", "")
-                            if user_name.startswith("User "):
+                            if user_info.get("is_auto"):
                                 user_id = user_info.get("id", "")
-                                print(f"🧹 Removing auto-user: {user_name}")
-                                self.firestore_manager.remove_user_from_room(room_id, user_id)
+                                logger.info(f"🧹 Removing auto-user: {user_name}")
+                                await asyncio.to_thread(
+                                    self.firestore_manager.remove_user_from_room, room_id, user_id
+                                )
+                                self._invalidate_room_info(room_id)
                                 if room_id in self.room_users:
                                     self.room_users[room_id].discard(user_id)
+                                self._unindex_connection(ws)
                                 del self.connection_users[ws]
-                                self.active_connections[room_id].remove(ws)
+                                self.active_connections[room_id].discard(ws)
                 
                 # Clean up empty rooms (no real users left)
                 if room_id in self.active_connections and len(self.active_connections[room_id]) == 0:
                     del self.active_connections[room_id]
                     # Schedule cleanup for this room in 5 minutes
                     self._schedule_room_cleanup(room_id)
-                    # Trigger cleanup check
-                    self.trigger_cleanup_if_needed()
+                    # Trigger cleanup check off-loop — it can run Firestore
+                    # deletes inline and take seconds
+                    await asyncio.to_thread(self.trigger_cleanup_if_needed)
                 elif len(real_users_in_room) == 0 and room_id in self.active_connections:
                     # No real users left, only auto-generated users - schedule cleanup
-                    print(f"🔄 No real users left in {room_id}, only auto-generated users. Scheduling cleanup.")
+                    logger.info(f"🔄 No real users left in {room_id}, only auto-generated users. Scheduling cleanup.")
                     self._schedule_room_cleanup(room_id)
-                    self.trigger_cleanup_if_needed()
+                    await asyncio.to_thread(self.trigger_cleanup_if_needed)
                 
                 if room_id in self.room_users and len(self.room_users[room_id]) == 0:
                     del self.room_users[room_id]
@@ -493,6 +726,144 @@ class ConnectionManager:
             # NEW: Clean up heartbeat tracking
             if websocket in self.connection_heartbeats:
                 del self.connection_heartbeats[websocket]
+            self.binary_connections.discard(websocket)
+            task = self._heartbeat_tasks.pop(websocket, None)
+            # The ping task itself may be the caller — a task must not cancel
+            # itself mid-disconnect
+            if task is not None and task is not asyncio.current_task():
+                task.cancel()
+
+    def _mark_canvas_dirty(self, room_id: str):
+        """Queue a full canvas rewrite for the next debounced Firestore flush"""
+        self._dirty_rooms.add(room_id)
+        self._ensure_canvas_flush_task()
+
+    def _queue_stroke(self, room_id: str, stroke: Dict):
+        """Queue a single new stroke for an append-only Firestore flush"""
+        self._pending_strokes.setdefault(room_id, []).append(stroke)
+        self._ensure_canvas_flush_task()
+
+    def _ensure_canvas_flush_task(self):
+        # Lazy start so the loop only exists while there is work (and so no
+        # task needs to be created before the event loop is running)
+        if self._canvas_flush_task is None or self._canvas_flush_task.done():
+            self._canvas_flush_task = asyncio.create_task(self._canvas_flush_loop())
+
+    async def _canvas_flush_loop(self):
+        """Flush dirty canvases to Firestore until none remain"""
+        while True:
+            await asyncio.sleep(2)
+            # Full rewrites win over appends for the same room
+            dirty = [rid for rid in self._dirty_rooms if rid in self.canvas_states]
+            self._dirty_rooms.clear()
+            pending = {
+                rid: strokes for rid, strokes in self._pending_strokes.items()
+                if rid in self.canvas_states and rid not in dirty
+            }
+            self._pending_strokes = {}
+
+            async def _write(func, *args):
+                async with self._firestore_sem:
+                    return await asyncio.to_thread(func, *args)
+
+            writes = [
+                _write(
+                    self.firestore_manager.save_canvas_state,
+                    rid,
+                    list(self.canvas_states.get(rid, []))
+                ) for rid in dirty
+            ]
+            # New strokes go up as ArrayUnion appends — O(new strokes) on the
+            # wire instead of rewriting the whole history
+            writes.extend(
+                _write(self.firestore_manager.append_canvas_strokes, rid, strokes)
+                for rid, strokes in pending.items()
+            )
+            if writes:
+                await asyncio.gather(*writes, return_exceptions=True)
+            if not self._dirty_rooms and not self._pending_strokes:
+                return
+
+    def _queue_chat_message(self, item: Dict):
+        self._pending_chat.append(item)
+        if self._chat_flush_task is None or self._chat_flush_task.done():
+            self._chat_flush_task = asyncio.create_task(self._chat_flush_loop())
+
+    async def _chat_flush_loop(self):
+        """Write queued chat messages in batches until none remain"""
+        while True:
+            await asyncio.sleep(self._CHAT_FLUSH_SECONDS)
+            pending, self._pending_chat = self._pending_chat, []
+            if not pending:
+                return
+            for start in range(0, len(pending), self._CHAT_BATCH_SIZE):
+                chunk = pending[start:start + self._CHAT_BATCH_SIZE]
+                async with self._firestore_sem:
+                    await asyncio.to_thread(
+                        self.firestore_manager.save_chat_messages, chunk
+                    )
+
+    async def _fan_out(self, room_id: str, message: dict, sender: WebSocket = None):
+        """Serialize a message once per encoding and send it to every
+        connection in the room concurrently.
+
+        Clients that opted into MessagePack (by sending binary frames) get
+        binary frames back; everyone else gets JSON text. Each encoding runs
+        at most once per broadcast, and only if someone needs it. All sends
+        run under one gather, so broadcast wall time is the slowest recipient
+        instead of the sum of all of them; recipients that raise are
+        disconnected afterwards.
+        """
+        room_connections = self.active_connections.get(room_id)
+        if not room_connections:
+            return
+        # Set difference instead of a per-connection comparison scan; the
+        # tuple is an immutable snapshot, so disconnects during the gather
+        # can't mutate what's being iterated and results pair back to their
+        # connections by position
+        connections = tuple(room_connections - {sender}) if sender is not None else tuple(room_connections)
+        if not connections:
+            return
+
+        text_payload = None
+        binary_payload = None
+        sends = []
+        for connection in connections:
+            if connection in self.binary_connections:
+                if binary_payload is None:
+                    binary_payload = msgpack.packb(message, use_bin_type=True)
+                sends.append(connection.send_bytes(binary_payload))
+            else:
+                if text_payload is None:
+                    text_payload = orjson.dumps(message).decode()
+                sends.append(connection.send_text(text_payload))
+
+        results = await asyncio.gather(*sends, return_exceptions=True)
+        broken = [
+            connection for connection, result in zip(connections, results)
+            if isinstance(result, Exception)
+        ]
+        if broken:
+            # A network blip drops many clients at once; tear them down
+            # concurrently so the cost is one disconnect's latency, not N
+            await asyncio.gather(
+                *(self.disconnect(connection, room_id) for connection in broken),
+                return_exceptions=True
+            )
+
+    async def _broadcast(self, room_id: str, message_type: str, data: dict,
+                         sender: WebSocket = None, ms_timestamp: bool = False):
+        """Wrap data in the standard envelope and fan it out to the room.
+
+        Drawing-rate envelopes pass ms_timestamp=True and carry integer
+        epoch-ms; low-rate lifecycle messages keep the ISO string, which is
+        easier on the eyes when debugging.
+        """
+        await self._fan_out(room_id, {
+            "type": message_type,
+            "data": data,
+            "timestamp": _now_ms() if ms_timestamp else _now_iso()
+        }, sender)
 
     async def broadcast_draw(self, room_id: str, data: dict, sender: WebSocket):
         if room_id in self.active_connections:
@@ -500,60 +871,28 @@ class ConnectionManager:
             if room_id not in self.canvas_states:
                 self.canvas_states[room_id] = []
             self.canvas_states[room_id].append(data)
+
+            # Queue just the new stroke for the debounced append-only flush
+            self._queue_stroke(room_id, data)
             
-            # Save canvas state to Firestore
-            self.firestore_manager.save_canvas_state(room_id, self.canvas_states[room_id])
-            
-            message = {
-                "type": "draw",
-                "data": data,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            # Create a copy of the list to avoid modification during iteration
-            connections = self.active_connections[room_id].copy()
-            broken_connections = []
-            for connection in connections:
-                if connection != sender:  # Don't send back to sender
-                    try:
-                        await connection.send_text(json.dumps(message))
-                    except:
-                        # Mark for removal instead of immediate disconnect
-                        broken_connections.append(connection)
-            
-            # Remove broken connections after iteration
-            for connection in broken_connections:
-                        await self.disconnect(connection, room_id)
+            await self._broadcast(room_id, "draw", data, sender, ms_timestamp=True)
 
     async def broadcast_stroke_start(self, room_id: str, stroke_data: dict, sender: WebSocket):
         """Broadcast stroke start event"""
         if room_id in self.active_connections:
             # Initialize active strokes for this room if not exists
-            if room_id not in self.active_strokes:
-                self.active_strokes[room_id] = {}
+            strokes = self.active_strokes.setdefault(room_id, OrderedDict())
             
-            # Store the stroke
+            # Store the stroke, evicting the oldest in-progress one if the
+            # room is at its cap
             stroke_id = stroke_data.get("id")
-            self.active_strokes[room_id][stroke_id] = stroke_data
-            
-            message = {
-                "type": "stroke_start",
-                "data": stroke_data,
-                "timestamp": datetime.now().isoformat()
-            }
+            if len(strokes) >= self._MAX_ACTIVE_STROKES and stroke_id not in strokes:
+                evicted_id, _ = strokes.popitem(last=False)
+                self._stroke_started.get(room_id, {}).pop(evicted_id, None)
+            strokes[stroke_id] = stroke_data
+            self._stroke_started.setdefault(room_id, {})[stroke_id] = datetime.now()
             
-            # Broadcast to all other users
-            connections = self.active_connections[room_id].copy()
-            broken_connections = []
-            for connection in connections:
-                if connection != sender:
-                    try:
-                        await connection.send_text(json.dumps(message))
-                    except:
-                        broken_connections.append(connection)
-            
-            for connection in broken_connections:
-                await self.disconnect(connection, room_id)
+            await self._broadcast(room_id, "stroke_start", stroke_data, sender, ms_timestamp=True)
 
     async def broadcast_stroke_point(self, room_id: str, stroke_id: str, point: dict, sender: WebSocket):
         """Broadcast stroke point event"""
@@ -564,28 +903,37 @@ class ConnectionManager:
                 if "points" not in stroke:
                     stroke["points"] = []
                 stroke["points"].append(point)
+                # Cap runaway point streams; keep the most recent half
+                if len(stroke["points"]) > self._MAX_STROKE_POINTS:
+                    del stroke["points"][:-self._STROKE_POINTS_KEEP]
             
-            message = {
-                "type": "stroke_point",
-                "data": {
-                    "strokeId": stroke_id,
-                    "point": point
-                },
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            # Broadcast to all other users
-            connections = self.active_connections[room_id].copy()
-            broken_connections = []
-            for connection in connections:
-                if connection != sender:
-                    try:
-                        await connection.send_text(json.dumps(message))
-                    except:
-                        broken_connections.append(connection)
-            
-            for connection in broken_connections:
-                await self.disconnect(connection, room_id)
+            # Buffer the point instead of broadcasting it immediately; the
+            # per-room flush task coalesces everything that arrived within
+            # the window into a single stroke_points_batch frame per sender
+            room_buffer = self._pending_points.setdefault(room_id, {})
+            room_buffer.setdefault(sender, {}).setdefault(stroke_id, []).append(point)
+            self._ensure_point_flush_task(room_id)
+
+    def _ensure_point_flush_task(self, room_id: str):
+        task = self._point_flush_tasks.get(room_id)
+        if task is None or task.done():
+            self._point_flush_tasks[room_id] = asyncio.create_task(
+                self._point_flush_loop(room_id)
+            )
+
+    async def _point_flush_loop(self, room_id: str):
+        """Flush buffered stroke points for one room until none remain"""
+        while True:
+            await asyncio.sleep(self._POINT_FLUSH_SECONDS)
+            buffered = self._pending_points.pop(room_id, None)
+            if not buffered:
+                self._point_flush_tasks.pop(room_id, None)
+                return
+            for sender, strokes in buffered.items():
+                await self._broadcast(
+                    room_id, "stroke_points_batch", {"strokes": strokes},
+                    sender, ms_timestamp=True
+                )
 
     async def broadcast_stroke_end(self, room_id: str, stroke_id: str, sender: WebSocket):
         """Broadcast stroke end event and save to canvas state"""
@@ -598,119 +946,45 @@ class ConnectionManager:
                 if room_id not in self.canvas_states:
                     self.canvas_states[room_id] = []
                 self.canvas_states[room_id].append(stroke)
-                
-                # Save to Firestore
-                self.firestore_manager.save_canvas_state(room_id, self.canvas_states[room_id])
+
+                # Queue just the completed stroke for the append-only flush
+                self._queue_stroke(room_id, stroke)
                 
                 # Remove from active strokes
                 del self.active_strokes[room_id][stroke_id]
+                self._stroke_started.get(room_id, {}).pop(stroke_id, None)
             
-            message = {
-                "type": "stroke_end",
-                "data": {
-                    "strokeId": stroke_id
-                },
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            # Broadcast to all other users
-            connections = self.active_connections[room_id].copy()
-            broken_connections = []
-            for connection in connections:
-                if connection != sender:
-                    try:
-                        await connection.send_text(json.dumps(message))
-                    except:
-                        broken_connections.append(connection)
-            
-            for connection in broken_connections:
-                await self.disconnect(connection, room_id)
+            await self._broadcast(room_id, "stroke_end", {"strokeId": stroke_id}, sender, ms_timestamp=True)
 
     async def broadcast_chat(self, room_id: str, data: dict, sender: WebSocket):
         if room_id in self.active_connections:
-            # Save chat message to Firestore
-            user_id = data.get("userId", "unknown")
-            user_name = data.get("userName", "Unknown")
-            message_text = data.get("message", "")
-            file_url = data.get("fileUrl")
-            file_name = data.get("fileName")
-            file_type = data.get("fileType")
-            
-            self.firestore_manager.save_chat_message(
-                room_id, user_id, user_name, message_text, file_url, file_name, file_type
-            )
-            
-            message = {
-                "type": "chat",
-                "data": data,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            # Create a copy of the list to avoid modification during iteration
-            connections = self.active_connections[room_id].copy()
-            print(f"Broadcasting chat message to {len(connections)} connections in room {room_id}")
-            print(f"Sender excluded, broadcasting to {len([c for c in connections if c != sender])} other connections")
-            
-            broken_connections = []
-            for connection in connections:
-                if connection != sender:  # Don't send back to sender
-                    try:
-                        await connection.send_text(json.dumps(message))
-                        print(f"Sent chat message to connection")
-                    except:
-                        # Mark for removal instead of immediate disconnect
-                        broken_connections.append(connection)
-                        print(f"Failed to send chat message to connection")
+            # Queue the message for the batched background write; the
+            # synchronous save used to block the event loop for a Firestore
+            # round-trip before anyone saw the message
+            # Stamp arrival time now — the flush loop batches up to 100ms
+            # of messages into one commit, and get_room_messages orders by
+            # timestamp, so a shared batch-time stamp would leave same-batch
+            # messages tie-broken by random document id
+            self._queue_chat_message({
+                "room_id": room_id,
+                "user_id": data.get("userId", "unknown"),
+                "user_name": data.get("userName", "Unknown"),
+                "message": data.get("message", ""),
+                "timestamp": datetime.now(timezone.utc),
+                "file_url": data.get("fileUrl"),
+                "file_name": data.get("fileName"),
+                "file_type": data.get("fileType")
+            })
             
-            # Remove broken connections after iteration
-            for connection in broken_connections:
-                        await self.disconnect(connection, room_id)
+            await self._broadcast(room_id, "chat", data, sender)
 
     async def broadcast_user_joined(self, room_id: str, data: dict, sender: WebSocket):
         if room_id in self.active_connections:
-            message = {
-                "type": "user_joined",
-                "data": data,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            # Create a copy of the list to avoid modification during iteration
-            connections = self.active_connections[room_id].copy()
-            broken_connections = []
-            for connection in connections:
-                if connection != sender:  # Don't send back to sender
-                    try:
-                        await connection.send_text(json.dumps(message))
-                    except:
-                        # Mark for removal instead of immediate disconnect
-                        broken_connections.append(connection)
-            
-            # Remove broken connections after iteration
-            for connection in broken_connections:
-                        await self.disconnect(connection, room_id)
+            await self._broadcast(room_id, "user_joined", data, sender)
 
     async def broadcast_user_left(self, room_id: str, data: dict, sender: WebSocket):
         if room_id in self.active_connections:
-            message = {
-                "type": "user_left",
-                "data": data,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            # Create a copy of the list to avoid modification during iteration
-            connections = self.active_connections[room_id].copy()
-            broken_connections = []
-            for connection in connections:
-                if connection != sender:  # Don't send back to sender
-                    try:
-                        await connection.send_text(json.dumps(message))
-                    except:
-                        # Mark for removal instead of immediate disconnect
-                        broken_connections.append(connection)
-            
-            # Remove broken connections after iteration
-            for connection in broken_connections:
-                        await self.disconnect(connection, room_id)
+            await self._broadcast(room_id, "user_left", data, sender)
 
     def get_room_users(self, room_id: str) -> List[str]:
         if room_id in self.room_users:
@@ -730,23 +1004,34 @@ class ConnectionManager:
             room_id = self.connection_users[websocket]["room_id"]
             
             # Check if new username is available globally
-            if not new_name.startswith("User "):
+            if not self._is_auto_name(new_name):
                 is_available = self.firestore_manager.is_username_available_globally(new_name, user_id)
                 if not is_available:
-                    print(f"Username {new_name} is not available globally")
+                    logger.warning(f"Username {new_name} is not available globally")
                     return False
             
-            # Update the username in connection_users
+            # Update the username in connection_users (and keep the
+            # auto-user index in sync with the new name)
             self.connection_users[websocket]["name"] = new_name
+            self.connection_users[websocket]["is_auto"] = self._is_auto_name(new_name)
+            self._drop_username(old_name, websocket)
+            self._username_connections.setdefault(new_name, set()).add(websocket)
+            self._drop_room_name(room_id, old_name)
+            self._room_name_index.setdefault(room_id, set()).add(new_name)
+            if self._is_auto_name(new_name):
+                self._auto_users.add((room_id, user_id, websocket))
+            else:
+                self._auto_users.discard((room_id, user_id, websocket))
             
             # Update in Firestore
             self.firestore_manager.update_user_name(room_id, user_id, new_name)
+            self._invalidate_room_info(room_id)
             
             # Handle global registration
-            if not old_name.startswith("User "):
+            if not self._is_auto_name(old_name):
                 self.firestore_manager.unregister_global_user(old_name)
             
-            if not new_name.startswith("User "):
+            if not self._is_auto_name(new_name):
                 self.firestore_manager.register_global_user(new_name, user_id, room_id)
             
             # Broadcast name change to other users
@@ -754,10 +1039,10 @@ class ConnectionManager:
                 "user_id": user_id,
                 "old_name": old_name,
                 "new_name": new_name,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": _now_iso()
             }, websocket)
             
-            print(f"User {old_name} changed name to {new_name}")
+            logger.info(f"User {old_name} changed name to {new_name}")
             return True
         
         return False
@@ -765,142 +1050,107 @@ class ConnectionManager:
     async def broadcast_name_change(self, room_id: str, data: dict, sender: WebSocket):
         """Broadcast user name change to all users in room"""
         if room_id in self.active_connections:
-            message = {
-                "type": "name_change",
-                "data": data,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            # Create a copy of the list to avoid modification during iteration
-            connections = self.active_connections[room_id].copy()
-            broken_connections = []
-            for connection in connections:
-                if connection != sender:  # Don't send back to sender
-                    try:
-                        await connection.send_text(json.dumps(message))
-                    except:
-                        # Mark for removal instead of immediate disconnect
-                        broken_connections.append(connection)
-            
-            # Remove broken connections after iteration
-            for connection in broken_connections:
-                await self.disconnect(connection, room_id)
+            await self._broadcast(room_id, "name_change", data, sender)
 
     def get_room_info(self, room_id: str) -> dict:
         """Get detailed information about a room"""
         if room_id not in self.active_connections:
             return {"room_id": room_id, "users": [], "count": 0}
         
-        # Clean up any broken connections first
-        active_connections = []
-        for websocket in self.active_connections[room_id]:
-            if websocket in self.connection_users:
-                active_connections.append(websocket)
-            else:
-                # Remove orphaned connections
-                self.active_connections[room_id].remove(websocket)
+        # Clean up any orphaned connections first
+        connections = self.active_connections[room_id]
+        orphaned = {ws for ws in connections if ws not in self.connection_users}
+        if orphaned:
+            connections -= orphaned
         
-        # Update the active connections list
-        self.active_connections[room_id] = active_connections
+        # Serve repeat reads from the short-lived cache; room_info gets
+        # polled and re-broadcast far more often than membership changes
+        cached = self._room_info_cache.get(room_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
         
         # Get users from Firestore
         firestore_users = self.firestore_manager.get_room_users(room_id)
         
-        # Filter out auto-generated usernames and convert datetime objects
-        users = []
-        for user in firestore_users:
-            if user.get("name") and not user["name"].startswith("User "):
-                # Convert datetime objects to ISO strings for JSON serialization
-                user_data = {
-                    "id": user.get("id"),
-                    "name": user.get("name"),
-                    "joined_at": user.get("joined_at").isoformat() if hasattr(user.get("joined_at"), 'isoformat') else str(user.get("joined_at", "")),
-                    "is_online": user.get("is_online", True)
-                }
-                users.append(user_data)
-        
-        print(f"Room {room_id} - Firestore users: {[u.get('name', 'Unknown') for u in users]}")
-        
-        return {
+        # Filter out auto-generated usernames; joined_at arrives as an ISO
+        # string already (normalized in firestore_manager.get_room_users)
+        users = [
+            {
+                "id": user.get("id"),
+                "name": user.get("name"),
+                "joined_at": user.get("joined_at") or "",
+                "is_online": user.get("is_online", True)
+            }
+            for user in firestore_users
+            if user.get("name") and not user.get("is_auto", self._is_auto_name(user["name"]))
+        ]
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Room {room_id} - Firestore users: {[u.get('name', 'Unknown') for u in users]}")
+        
+        info = {
             "room_id": room_id,
             "users": users,
             "count": len(users)
         }
+        self._room_info_cache[room_id] = (time.monotonic() + self._ROOM_INFO_TTL, info)
+        return info
 
     async def broadcast_room_info(self, room_id: str):
         """Broadcast updated room info to all users in the room"""
         if room_id in self.active_connections:
-            room_info = self.get_room_info(room_id)
-            message = {
-                "type": "room_info",
-                "data": room_info,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            # Create a copy of the list to avoid modification during iteration
-            connections = self.active_connections[room_id].copy()
-            broken_connections = []
-            for connection in connections:
-                try:
-                    await connection.send_text(json.dumps(message))
-                except:
-                    # Mark for removal instead of immediate disconnect
-                    broken_connections.append(connection)
-            
-            # Remove broken connections after iteration
-            for connection in broken_connections:
-                await self.disconnect(connection, room_id)
+            # No sender here — everyone gets the update
+            await self._broadcast(room_id, "room_info", self.get_room_info(room_id))
 
     def get_all_users(self) -> List[str]:
         """Get all currently active usernames (excluding auto-generated ones)"""
-        usernames = set()
-        for user_info in self.connection_users.values():
-            if "name" in user_info:
-                username = user_info["name"]
-                # Only include usernames that are not auto-generated (not starting with "User ")
-                if not username.startswith("User "):
-                    usernames.add(username)
-        return list(usernames)
+        # The username index already holds one key per distinct name
+        return [name for name in self._username_connections
+                if not self._is_auto_name(name)]
 
     def is_username_available(self, username: str, current_username: str = None) -> bool:
         """Check if a username is available"""
-        # Don't allow usernames that start with "User " (auto-generated)
-        if username.startswith("User "):
+        # Don't allow usernames that collide with auto-generated ones
+        if self._is_auto_name(username):
             return False
             
-        all_users = self.get_all_users()
         # If checking for current username, exclude it from the check
         if current_username and username == current_username:
             return True
-        return username not in all_users
+        return username not in self._username_connections
 
     def change_username(self, old_username: str, new_username: str) -> bool:
         """Change a user's username across all connections"""
         if not self.is_username_available(new_username, old_username):
             return False
         
-        # Find all connections with the old username and update them
-        updated_count = 0
-        for websocket, user_info in self.connection_users.items():
-            if user_info.get("name") == old_username:
+        # Move every connection under the old name to the new bucket
+        sockets = self._username_connections.pop(old_username, set())
+        for websocket in sockets:
+            user_info = self.connection_users.get(websocket)
+            if user_info is not None:
                 user_info["name"] = new_username
-                updated_count += 1
+                user_info["is_auto"] = False  # auto-style names never pass the availability check
+                ws_room = user_info.get("room_id")
+                self._drop_room_name(ws_room, old_username)
+                self._room_name_index.setdefault(ws_room, set()).add(new_username)
+        if sockets:
+            self._username_connections.setdefault(new_username, set()).update(sockets)
         
-        return updated_count > 0
+        return bool(sockets)
 
     def get_all_rooms(self) -> List[Dict]:
-        """Get all active rooms with metadata"""
+        """Get all active rooms from the denormalized summary — no Firestore
+        round-trip per room"""
         rooms = []
         for room_id in self.active_connections.keys():
-            room_info = self.get_room_info(room_id)
-            room_meta = self.room_metadata.get(room_id, {})
-            
+            summary = self._room_summary.get(room_id, {})
             rooms.append({
                 "id": room_id,
-                "name": room_id,  # For now, room_id is the name
-                "userCount": room_info["count"],
-                "createdAt": room_meta.get("created_at", datetime.now().isoformat()),
-                "createdBy": room_meta.get("created_by", "Unknown")
+                "name": summary.get("name", room_id),
+                "userCount": len(self.room_users.get(room_id, ())),
+                "createdAt": summary.get("created_at", ""),
+                "createdBy": summary.get("created_by", "Unknown")
             })
         return rooms
 
@@ -910,14 +1160,14 @@ class ConnectionManager:
 
         # Initialize room if it doesn't exist
         if room_id not in self.active_connections:
-            self.active_connections[room_id] = []
+            self.active_connections[room_id] = set()
             self.room_users[room_id] = set()
 
-        # Store room metadata
-        self.room_metadata[room_id] = {
+        # Store the denormalized summary get_all_rooms reads from
+        self._room_summary[room_id] = {
+            "name": room_name,
             "created_at": datetime.now().isoformat(),
-            "created_by": created_by,
-            "name": room_name
+            "created_by": created_by
         }
 
         return room_id
@@ -928,49 +1178,25 @@ class ConnectionManager:
             # Clear canvas state (in-memory for performance)
             if room_id in self.canvas_states:
                 self.canvas_states[room_id] = []
+            self._pending_strokes.pop(room_id, None)
+            self._dirty_rooms.discard(room_id)
             
             # Clear canvas state in Firestore
             self.firestore_manager.save_canvas_state(room_id, [])
             
-            message = {
-                "type": "clear_canvas",
-                "data": {},
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            # Create a copy of the list to avoid modification during iteration
-            connections = self.active_connections[room_id].copy()
-            broken_connections = []
-            for connection in connections:
-                if connection != sender:  # Don't send back to sender
-                    try:
-                        await connection.send_text(json.dumps(message))
-                    except:
-                        # Mark for removal instead of immediate disconnect
-                        broken_connections.append(connection)
-            
-            # Remove broken connections after iteration
-            for connection in broken_connections:
-                await self.disconnect(connection, room_id)
+            await self._broadcast(room_id, "clear_canvas", {}, sender)
 
     def cleanup_connections(self):
         """Clean up broken connections and auto-generated usernames"""
         # Remove broken connections
         for room_id in list(self.active_connections.keys()):
-            active_connections = []
-            for websocket in self.active_connections[room_id]:
-                if websocket in self.connection_users:
-                    active_connections.append(websocket)
-                else:
-                    # Remove orphaned connections
-                    if websocket in self.active_connections[room_id]:
-                        self.active_connections[room_id].remove(websocket)
-            
-            # Update the active connections list
-            self.active_connections[room_id] = active_connections
+            connections = self.active_connections[room_id]
+            orphaned = {ws for ws in connections if ws not in self.connection_users}
+            if orphaned:
+                connections -= orphaned
             
             # Clean up empty rooms
-            if len(active_connections) == 0:
+            if len(connections) == 0:
                 del self.active_connections[room_id]
                 if room_id in self.room_users:
                     del self.room_users[room_id]
@@ -982,24 +1208,11 @@ class ConnectionManager:
 
     def cleanup_duplicate_users(self):
         """Remove duplicate users and auto-generated users that are no longer connected"""
-        # Track users by name in each room
-        room_user_names = {}
-        
-        # Build a map of room -> set of usernames
-        for websocket, user_info in self.connection_users.items():
-            room_id = user_info.get("room_id")
-            user_name = user_info.get("name")
-            
-            if room_id and user_name:
-                if room_id not in room_user_names:
-                    room_user_names[room_id] = set()
-                room_user_names[room_id].add(user_name)
-        
-        # Clean up auto-generated users that are no longer connected
+        # The incrementally-maintained room name index replaces the full
+        # rebuild over every connection this method used to start with
         for room_id in list(self.room_users.keys()):
-            if room_id in room_user_names:
-                connected_names = room_user_names[room_id]
-                
+            connected_names = self._room_name_index.get(room_id)
+            if connected_names:
                 # Get all users from Firestore for this room
                 firestore_users = self.firestore_manager.get_room_users(room_id)
                 
@@ -1008,11 +1221,13 @@ class ConnectionManager:
                     user_id = user.get("id")
                     
                     # Remove auto-generated users that are not connected
-                    if (user_name and user_name.startswith("User ") and 
+                    # (old docs predate the stored flag, hence the fallback)
+                    if (user.get("is_auto", self._is_auto_name(user_name)) and 
                         user_name not in connected_names):
-                        print(f"Removing disconnected auto-generated user: {user_name}")
+                        logger.info(f"Removing disconnected auto-generated user: {user_name}")
                         self.firestore_manager.remove_user_from_room(room_id, user_id)
+                        self._invalidate_room_info(room_id)
                         if room_id in self.room_users:
                             self.room_users[room_id].discard(user_id)
         
-        print("Cleanup completed - removed disconnected auto-generated users") 
\ No newline at end of file
+        logger.info("Cleanup completed - removed disconnected auto-generated users") 
\ No newline at end of file
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the cleanup scripts (force_cleanup_all, nuclear_cleanup)
+"""
+
+import asyncio
+
+import httpx
+import orjson
+
+async def cleanup_rooms(client: httpx.AsyncClient, rooms: list):
+    """Clean up every room's data.
+
+    One POST /cleanup/rooms with the whole id list — the backend fans the
+    per-room work out itself, so the client pays a single round-trip. If
+    the backend predates the bulk endpoint (404), fall back to per-room
+    POSTs gathered 8 at a time.
+    """
+    if not rooms:
+        return
+
+    try:
+        response = await client.post(
+            "/cleanup/rooms",
+            json={"ids": [room.get('id') for room in rooms]},
+            timeout=120,
+        )
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            print(f"   ✅ {data.get('message', 'Rooms cleaned')}")
+            for room_id in data.get('failed_rooms', []):
+                print(f"      ❌ Failed to clean room {room_id}")
+            return
+        elif response.status_code != 404:
+            print(f"   ❌ Bulk room cleanup failed: {response.status_code}")
+            return
+    except Exception as e:
+        print(f"   ❌ Error in bulk room cleanup: {e}")
+        return
+
+    # Backend predates /cleanup/rooms — POST each room individually
+    semaphore = asyncio.Semaphore(8)
+    done = 0
+
+    async def clean_one(room):
+        nonlocal done
+        room_id = room.get('id')
+        room_name = room.get('name', 'Unknown')
+        async with semaphore:
+            try:
+                response = await client.post(f"/cleanup/room-data/{room_id}", timeout=10)
+                done += 1
+                if response.status_code == 200:
+                    print(f"   [{done}/{len(rooms)}] ✅ Cleaned room: {room_name} (ID: {room_id})")
+                else:
+                    print(f"   [{done}/{len(rooms)}] ❌ Failed to clean {room_name}: {response.status_code}")
+            except Exception as e:
+                done += 1
+                print(f"   [{done}/{len(rooms)}] ❌ Error cleaning {room_name}: {e}")
+
+    await asyncio.gather(*(clean_one(room) for room in rooms))
+
+async def verify_clean(client: httpx.AsyncClient, *, etag=None, cached_rooms=None, limit=5):
+    """Report what is left after a cleanup run.
+
+    Counts come from the server-side aggregation endpoints, so a clean
+    run verifies with two tiny responses; full payloads are fetched only
+    when something is left worth listing. Pass the ETag and parsed rooms
+    from the initial /rooms snapshot and an unchanged listing is served
+    from memory via a 304. ``limit`` caps how many leftover usernames are
+    printed (None prints them all).
+    """
+    try:
+        # Check rooms
+        room_count = None
+        response = await client.get("/rooms/count", timeout=15)
+        if response.status_code == 200:
+            room_count = orjson.loads(response.content).get('count', 0)
+
+        if room_count == 0:
+            print("   📊 Remaining rooms: 0")
+            print("   ✅ All rooms cleaned up successfully!")
+        else:
+            # Non-zero (or backend predates the count endpoint) — fetch the
+            # listing so the leftovers can be named. The conditional GET
+            # turns an unchanged listing into an empty 304 served from the
+            # initial snapshot.
+            headers = {"If-None-Match": etag} if etag else {}
+            response = await client.get("/rooms", timeout=15, headers=headers)
+            rooms = None
+            if response.status_code == 304:
+                rooms = cached_rooms or []
+            elif response.status_code == 200:
+                data = orjson.loads(response.content)
+                rooms = data.get('rooms', []) if isinstance(data, dict) else data
+            if rooms is not None:
+                print(f"   📊 Remaining rooms: {len(rooms)}")
+
+                if len(rooms) == 0:
+                    print("   ✅ All rooms cleaned up successfully!")
+                else:
+                    print("   ⚠️  Some rooms still exist:")
+                    for room in rooms:
+                        print(f"      - {room.get('name', 'Unknown')} (ID: {room.get('id', 'Unknown')})")
+
+        # Check global users
+        user_count = None
+        response = await client.get("/users/global/count", timeout=15)
+        if response.status_code == 200:
+            user_count = orjson.loads(response.content).get('count', 0)
+
+        if user_count == 0:
+            print("   👥 Remaining global users: 0")
+            print("   ✅ All global users cleaned up successfully!")
+        else:
+            response = await client.get("/users/global", timeout=15)
+            if response.status_code == 200:
+                data = orjson.loads(response.content)
+                global_users = data.get('global_users', [])
+                print(f"   👥 Remaining global users: {len(global_users)}")
+
+                if len(global_users) == 0:
+                    print("   ✅ All global users cleaned up successfully!")
+                else:
+                    print("   ⚠️  Some global users still exist:")
+                    shown = global_users if limit is None else global_users[:limit]
+                    for user in shown:
+                        print(f"      - {user.get('username', 'Unknown')}")
+                    if len(global_users) > len(shown):
+                        print(f"      ... and {len(global_users) - len(shown)} more")
+
+    except Exception as e:
+        print(f"   ❌ Error during verification: {e}")
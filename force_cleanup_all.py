@@ -4,156 +4,144 @@ FORCE CLEANUP ALL - Nuclear option to clear everything from Firestore and GCP St
 ⚠️  WARNING: This will delete ALL data - use with caution!
 """
 
+import asyncio
 import os
 import sys
-import requests
-import json
-from datetime import datetime
 
-def force_cleanup_all():
+import httpx
+import orjson
+
+from cleanup_common import cleanup_rooms, verify_clean
+
+async def force_cleanup_all():
     """Nuclear cleanup - clears everything from Firestore and GCP Storage"""
-    base_url = "http://localhost:8000"
-    
+    base_url = os.getenv("BACKEND_URL", "http://localhost:8000")
+
     print("☢️  NUCLEAR FORCE CLEANUP - CLEARING EVERYTHING")
     print("=" * 60)
     print("⚠️  WARNING: This will delete ALL data from Firestore and GCP Storage!")
     print("⚠️  This action cannot be undone!")
     print("=" * 60)
-    
+
     # Ask for confirmation
     confirm = input("Type 'YES' to confirm you want to delete everything: ")
     if confirm != "YES":
         print("❌ Cleanup cancelled")
         return
-    
+
     print("\n🚀 Starting nuclear cleanup...")
     print("=" * 60)
-    
+
     try:
-        # Step 1: Get all rooms first
-        print("📋 Step 1: Getting all rooms...")
-        response = requests.get(f"{base_url}/rooms", timeout=15)
-        if response.status_code == 200:
-            data = response.json()
-            rooms = data.get('rooms', []) if isinstance(data, dict) else data
-            print(f"   Found {len(rooms)} rooms to clean up")
-            
-            # Step 2: Clean up each room's data
-            print("\n🧹 Step 2: Cleaning up room data...")
-            for i, room in enumerate(rooms, 1):
-                room_id = room.get('id')
-                room_name = room.get('name', 'Unknown')
-                print(f"   [{i}/{len(rooms)}] Cleaning room: {room_name} (ID: {room_id})")
-                
-                try:
-                    # Clean up room data
-                    response = requests.post(f"{base_url}/cleanup/room-data/{room_id}", timeout=10)
-                    if response.status_code == 200:
-                        print(f"      ✅ Room data cleaned")
-                    else:
-                        print(f"      ❌ Failed to clean room data: {response.status_code}")
-                except Exception as e:
-                    print(f"      ❌ Error cleaning room data: {e}")
-        else:
-            print(f"❌ Failed to get rooms: {response.status_code}")
-        
-        # Step 3: Clean up orphaned files
-        print("\n🗂️  Step 3: Cleaning up orphaned files...")
-        try:
-            response = requests.post(f"{base_url}/cleanup/orphaned-files", timeout=30)
-            if response.status_code == 200:
-                data = response.json()
-                files_removed = data.get('files_removed', 0)
-                print(f"   ✅ Removed {files_removed} orphaned files")
-            else:
-                print(f"   ❌ Failed to clean orphaned files: {response.status_code}")
-        except Exception as e:
-            print(f"   ❌ Error cleaning orphaned files: {e}")
-        
-        # Step 4: Clean up orphaned data
-        print("\n🗑️  Step 4: Cleaning up orphaned data...")
-        try:
-            response = requests.post(f"{base_url}/cleanup/orphaned-data", timeout=30)
-            if response.status_code == 200:
-                data = response.json()
-                print(f"   ✅ Orphaned data cleanup results:")
-                for key, value in data.items():
-                    print(f"      {key}: {value}")
-            else:
-                print(f"   ❌ Failed to clean orphaned data: {response.status_code}")
-        except Exception as e:
-            print(f"   ❌ Error cleaning orphaned data: {e}")
-        
-        # Step 5: Force cleanup stuck users
-        print("\n👥 Step 5: Force cleaning stuck users...")
-        try:
-            response = requests.post(f"{base_url}/cleanup/force-stuck-users", timeout=15)
-            if response.status_code == 200:
-                data = response.json()
-                users_removed = data.get('users_removed', 0)
-                print(f"   ✅ Removed {users_removed} stuck users")
-            else:
-                print(f"   ❌ Failed to clean stuck users: {response.status_code}")
-        except Exception as e:
-            print(f"   ❌ Error cleaning stuck users: {e}")
-        
-        # Step 6: Comprehensive cleanup
-        print("\n🔄 Step 6: Running comprehensive cleanup...")
-        try:
-            response = requests.post(f"{base_url}/cleanup/comprehensive", timeout=30)
-            if response.status_code == 200:
-                data = response.json()
-                print(f"   ✅ Comprehensive cleanup completed:")
-                for key, value in data.items():
-                    print(f"      {key}: {value}")
-            else:
-                print(f"   ❌ Failed to run comprehensive cleanup: {response.status_code}")
-        except Exception as e:
-            print(f"   ❌ Error running comprehensive cleanup: {e}")
-        
-        # Step 7: Final verification
-        print("\n🔍 Step 7: Final verification...")
-        try:
-            # Check rooms
-            response = requests.get(f"{base_url}/rooms", timeout=15)
+        async with httpx.AsyncClient(
+            base_url=base_url,
+            timeout=30,
+            # Backend serves gzip via GZipMiddleware for bodies over 1 KB —
+            # the big verification payloads shrink ~10x on the wire
+            headers={"Accept-Encoding": "gzip, deflate", "Accept": "application/json"},
+            # Retry transient connection failures (RST, refused, DNS blips)
+            # at the transport layer so one flaky connect doesn't lose a
+            # whole cleanup step and force a rerun of the script
+            transport=httpx.AsyncHTTPTransport(retries=3),
+        ) as client:
+            # Pre-warm DNS + TCP (and sanity-check the backend) before any
+            # destructive work — the pooled connection established here is
+            # reused by every following request
+            try:
+                response = await client.get("/health", timeout=5)
+                if response.status_code != 200:
+                    print(f"❌ Backend not healthy: {response.status_code}")
+                    return
+            except Exception as e:
+                print(f"❌ Backend not responding: {e}")
+                return
+
+            # Step 1: Get all rooms first
+            print("📋 Step 1: Getting all rooms...")
+            rooms_etag = None
+            initial_rooms = []
+            response = await client.get("/rooms", timeout=15)
             if response.status_code == 200:
-                data = response.json()
+                # Stash the ETag so the verification re-read can be a
+                # conditional GET — a 304 means nothing changed and the
+                # snapshot below can be reused without a payload
+                rooms_etag = response.headers.get('etag')
+                data = orjson.loads(response.content)
                 rooms = data.get('rooms', []) if isinstance(data, dict) else data
-                print(f"   📊 Remaining rooms: {len(rooms)}")
-                
-                if len(rooms) == 0:
-                    print("   ✅ All rooms cleaned up successfully!")
+                initial_rooms = rooms
+                print(f"   Found {len(rooms)} rooms to clean up")
+
+                # Step 2: Clean up each room's data concurrently
+                print("\n🧹 Step 2: Cleaning up room data...")
+                await cleanup_rooms(client, rooms)
+            else:
+                print(f"❌ Failed to get rooms: {response.status_code}")
+
+            # Step 3: Clean up orphaned files
+            print("\n🗂️  Step 3: Cleaning up orphaned files...")
+            try:
+                response = await client.post("/cleanup/orphaned-files", timeout=30)
+                if response.status_code == 200:
+                    data = orjson.loads(response.content)
+                    files_removed = data.get('files_removed', 0)
+                    print(f"   ✅ Removed {files_removed} orphaned files")
                 else:
-                    print("   ⚠️  Some rooms still exist:")
-                    for room in rooms:
-                        print(f"      - {room.get('name', 'Unknown')} (ID: {room.get('id', 'Unknown')})")
-            
-            # Check global users
-            response = requests.get(f"{base_url}/users/global", timeout=15)
-            if response.status_code == 200:
-                data = response.json()
-                global_users = data.get('global_users', [])
-                print(f"   👥 Remaining global users: {len(global_users)}")
-                
-                if len(global_users) == 0:
-                    print("   ✅ All global users cleaned up successfully!")
+                    print(f"   ❌ Failed to clean orphaned files: {response.status_code}")
+            except Exception as e:
+                print(f"   ❌ Error cleaning orphaned files: {e}")
+
+            # Step 4: Clean up orphaned data
+            print("\n🗑️  Step 4: Cleaning up orphaned data...")
+            try:
+                response = await client.post("/cleanup/orphaned-data", timeout=30)
+                if response.status_code == 200:
+                    data = orjson.loads(response.content)
+                    print(f"   ✅ Orphaned data cleanup results:")
+                    for key, value in data.items():
+                        print(f"      {key}: {value}")
+                else:
+                    print(f"   ❌ Failed to clean orphaned data: {response.status_code}")
+            except Exception as e:
+                print(f"   ❌ Error cleaning orphaned data: {e}")
+
+            # Step 5: Force cleanup stuck users
+            print("\n👥 Step 5: Force cleaning stuck users...")
+            try:
+                response = await client.post("/cleanup/force-stuck-users", timeout=15)
+                if response.status_code == 200:
+                    data = orjson.loads(response.content)
+                    users_removed = data.get('users_removed', 0)
+                    print(f"   ✅ Removed {users_removed} stuck users")
+                else:
+                    print(f"   ❌ Failed to clean stuck users: {response.status_code}")
+            except Exception as e:
+                print(f"   ❌ Error cleaning stuck users: {e}")
+
+            # Step 6: Comprehensive cleanup
+            print("\n🔄 Step 6: Running comprehensive cleanup...")
+            try:
+                response = await client.post("/cleanup/comprehensive", timeout=30)
+                if response.status_code == 200:
+                    data = orjson.loads(response.content)
+                    print(f"   ✅ Comprehensive cleanup completed:")
+                    for key, value in data.items():
+                        print(f"      {key}: {value}")
                 else:
-                    print("   ⚠️  Some global users still exist:")
-                    for user in global_users[:5]:  # Show first 5
-                        print(f"      - {user.get('username', 'Unknown')}")
-                    if len(global_users) > 5:
-                        print(f"      ... and {len(global_users) - 5} more")
-                        
-        except Exception as e:
-            print(f"   ❌ Error during verification: {e}")
-        
+                    print(f"   ❌ Failed to run comprehensive cleanup: {response.status_code}")
+            except Exception as e:
+                print(f"   ❌ Error running comprehensive cleanup: {e}")
+
+            # Step 7: Final verification (shared with nuclear_cleanup)
+            print("\n🔍 Step 7: Final verification...")
+            await verify_clean(client, etag=rooms_etag, cached_rooms=initial_rooms)
+
         print("\n" + "=" * 60)
         print("🎉 NUCLEAR CLEANUP COMPLETED!")
         print("=" * 60)
         print("✅ All data has been cleared from Firestore and GCP Storage")
         print("✅ You can now start fresh with a clean slate")
         print("=" * 60)
-        
+
     except Exception as e:
         print(f"\n❌ Nuclear cleanup failed: {e}")
         import traceback
@@ -161,34 +149,34 @@ def force_cleanup_all():
 
 def show_status():
     """Show current status before cleanup"""
-    base_url = "http://localhost:8000"
-    
+    base_url = os.getenv("BACKEND_URL", "http://localhost:8000")
+
     print("📊 CURRENT STATUS BEFORE CLEANUP")
     print("=" * 40)
-    
+
     try:
         # Check rooms
-        response = requests.get(f"{base_url}/rooms", timeout=15)
+        response = httpx.get(f"{base_url}/rooms", timeout=15)
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             rooms = data.get('rooms', []) if isinstance(data, dict) else data
             print(f"📋 Rooms: {len(rooms)}")
             for room in rooms[:3]:  # Show first 3
                 print(f"   - {room.get('name', 'Unknown')} (ID: {room.get('id', 'Unknown')})")
             if len(rooms) > 3:
                 print(f"   ... and {len(rooms) - 3} more")
-        
+
         # Check global users
-        response = requests.get(f"{base_url}/users/global", timeout=15)
+        response = httpx.get(f"{base_url}/users/global", timeout=15)
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             global_users = data.get('global_users', [])
             print(f"👥 Global Users: {len(global_users)}")
             for user in global_users[:3]:  # Show first 3
                 print(f"   - {user.get('username', 'Unknown')}")
             if len(global_users) > 3:
                 print(f"   ... and {len(global_users) - 3} more")
-                
+
     except Exception as e:
         print(f"❌ Error getting status: {e}")
 
@@ -196,4 +184,4 @@ if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "status":
         show_status()
     else:
-        force_cleanup_all() 
\ No newline at end of file
+        asyncio.run(force_cleanup_all())